@@ -0,0 +1,288 @@
+"""
+Benchmark of the authentication and authorization hot path, running offline against an in-process JWKS.
+
+Measures the per call cost of each stage in isolation: token header parsing, signing key lookup,
+signature verification, user construction, scope extraction and authorization, as well as the full
+`get_claims`.  Then drives a sample `Router` app, authenticating with `BearerTokenAuthBackend`, through an
+in-process ASGI client, reporting requests/sec and the latency of each stage of those requests, as recorded
+through the tracing hooks.
+
+Save the results of a run with `--output before.json`, and compare a later run with `--baseline before.json`.
+
+Run with `poetry run python benchmarks/bench_auth_pipeline.py`.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import time
+import timeit
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+import httpx
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import Depends, FastAPI
+from starlette.requests import Request
+
+from regtech_api_commons.api.app import install
+from regtech_api_commons.api.dependencies import verify_user_lei_relation
+from regtech_api_commons.api.router_wrapper import Router
+from regtech_api_commons.models.auth import AuthenticatedUser
+from regtech_api_commons.oauth2.config import KeycloakSettings
+from regtech_api_commons.oauth2.jwks import JwksCache
+from regtech_api_commons.oauth2.oauth2_admin import OAuth2Admin
+from regtech_api_commons.oauth2.oauth2_backend import DEFAULT_SCOPE_CLAIMS, ClaimsAuthCredentials
+from regtech_api_commons.observability.tracing import set_tracer
+
+KID = "bench-key"
+LEI = "123456789BENCHLEI001"
+
+
+def to_jwk(private_key: rsa.RSAPrivateKey, kid: str) -> Dict[str, str]:
+    public_numbers = private_key.public_key().public_numbers()
+
+    def encode(number: int) -> str:
+        return base64.urlsafe_b64encode(number.to_bytes((number.bit_length() + 7) // 8, "big")).decode().rstrip("=")
+
+    return {"kty": "RSA", "kid": kid, "use": "sig", "alg": "RS256", "n": encode(public_numbers.n), "e": encode(65537)}
+
+
+def make_settings(**settings: Any) -> KeycloakSettings:
+    return KeycloakSettings(
+        **{
+            "kc_url": "http://keycloak",
+            "kc_realm": "regtech",
+            "kc_admin_client_id": "admin-cli",
+            "kc_admin_client_secret": "secret",
+            "kc_realm_url": "http://keycloak/realms/regtech",
+            "auth_url": "http://keycloak/realms/regtech/protocol/openid-connect/auth",
+            "token_url": "http://keycloak/realms/regtech/protocol/openid-connect/token",
+            "certs_url": "http://keycloak/realms/regtech/protocol/openid-connect/certs",
+            "auth_client": "regtech-client",
+            **settings,
+        },
+        _env_file=None,
+    )
+
+
+def make_claims(kc_settings: KeycloakSettings, institution_count: int) -> Dict[str, Any]:
+    return {
+        "iss": kc_settings.kc_realm_url.unicode_string(),
+        "aud": kc_settings.auth_client,
+        "exp": int(time.time()) + 3600,
+        "sub": "benchuser123",
+        "name": "Bench User",
+        "preferred_username": "bench_user",
+        "email": "bench@local.host",
+        "institutions": [f"/{LEI}"] + [f"/BENCHLEI{i:011d}" for i in range(institution_count - 1)],
+        "realm_access": {"roles": ["offline_access", "uma_authorization"]},
+        "resource_access": {"account": {"roles": ["manage-account", "view-profile"]}},
+    }
+
+
+def jwks_client(jwks: Dict[str, Any]) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=jwks)))
+
+
+class TimingTracer:
+    """
+    Tracer recording the duration of every span, by span name.
+    """
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: Dict[str, Any] | None = None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name].append(time.perf_counter() - start)
+
+
+def time_call(func: Callable[[], Any], number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1_000_000
+
+
+async def time_coroutine(func: Callable[[], Any], number: int) -> float:
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / number * 1_000_000
+
+
+async def bench_stages(token: str, jwks: Dict[str, Any], claims: Dict[str, Any], number: int) -> Dict[str, float]:
+    """
+    Per call cost of each stage in isolation, in microseconds.
+    """
+    kc_settings = make_settings()
+    jwks_cache = JwksCache(lambda: jwks)
+    key = jwks_cache.get_key(KID)
+    user = AuthenticatedUser.from_claim(claims, validate=False)
+    credentials = ClaimsAuthCredentials(claims, DEFAULT_SCOPE_CLAIMS, ("authenticated",))
+    request = Request({"type": "http", "user": user, "auth": credentials})
+
+    admin = OAuth2Admin(kc_settings, http_client=jwks_client(jwks))
+    await admin.awarm_keys()
+    cached_admin = OAuth2Admin(make_settings(claims_cache_size=1024), http_client=jwks_client(jwks))
+    await cached_admin.awarm_keys()
+
+    results = {
+        "parse header": time_call(lambda: jwt.get_unverified_header(token), number),
+        "key lookup": time_call(lambda: jwks_cache.get_key(KID), number),
+        "verify signature": time_call(
+            lambda: jwt.decode(
+                token,
+                key=key,
+                issuer=kc_settings.kc_realm_url.unicode_string(),
+                audience=kc_settings.auth_client,
+            ),
+            number,
+        ),
+        "user construction": time_call(lambda: AuthenticatedUser.from_claim(claims, validate=False), number),
+        "scope extraction": time_call(
+            lambda: ClaimsAuthCredentials(claims, DEFAULT_SCOPE_CLAIMS, ("authenticated",)).scope_set, number
+        ),
+        "authorization": time_call(lambda: verify_user_lei_relation(request, LEI), number),
+        "get_claims": time_call(lambda: admin.get_claims(token), number),
+        "aget_claims": await time_coroutine(lambda: admin.aget_claims(token), number),
+        "aget_claims (claims cache)": await time_coroutine(lambda: cached_admin.aget_claims(token), number),
+    }
+    await admin.aclose()
+    await cached_admin.aclose()
+    return results
+
+
+def make_app(oauth2_admin: OAuth2Admin) -> FastAPI:
+    app = FastAPI()
+    install(app, oauth2_admin=oauth2_admin, warm_jwks=False)
+    router = Router()
+
+    @router.get("/v1/institutions/{lei}", dependencies=[Depends(verify_user_lei_relation)])
+    async def get_institution(lei: str):
+        return {"lei": lei}
+
+    app.include_router(router)
+    return app
+
+
+async def drive_app(app: FastAPI, token: str, requests: int, concurrency: int) -> float:
+    """
+    Send the requests, `concurrency` at a time, returning the requests/sec.
+    """
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = iter(range(requests))
+
+        async def worker():
+            for _ in queue:
+                response = await client.get(f"/v1/institutions/{LEI}", headers=headers)
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return requests / (time.perf_counter() - start)
+
+
+async def bench_app(
+    token: str, jwks: Dict[str, Any], requests: int, concurrency: int, claims_cache: bool
+) -> Dict[str, Any]:
+    settings = make_settings(claims_cache_size=1024) if claims_cache else make_settings()
+    oauth2_admin = OAuth2Admin(settings, http_client=jwks_client(jwks))
+    await oauth2_admin.awarm_keys()
+    app = make_app(oauth2_admin)
+
+    await drive_app(app, token, min(requests, 100), concurrency)
+    requests_per_sec = await drive_app(app, token, requests, concurrency)
+
+    tracer = TimingTracer()
+    set_tracer(tracer)
+    try:
+        await drive_app(app, token, requests, concurrency)
+    finally:
+        set_tracer(None)
+    await oauth2_admin.aclose()
+
+    stages = {}
+    for name, durations in tracer.durations.items():
+        durations_us = [duration * 1_000_000 for duration in durations]
+        stages[name] = {
+            "mean": statistics.fmean(durations_us),
+            "p50": statistics.median(durations_us),
+            "p99": statistics.quantiles(durations_us, n=100)[-1] if len(durations_us) > 1 else durations_us[0],
+        }
+    return {"requests_per_sec": requests_per_sec, "stages": stages}
+
+
+def compare(value: float, baseline: float | None, higher_is_better: bool = False) -> str:
+    if not baseline:
+        return ""
+    change = (value - baseline) / baseline * 100
+    better = change > 0 if higher_is_better else change < 0
+    return f"  ({change:+.1f}% vs baseline{', better' if better and abs(change) >= 1 else ''})"
+
+
+def report(results: Dict[str, Any], baseline: Dict[str, Any] | None) -> None:
+    baseline = baseline or {}
+    print("Stages in isolation (us/call):")
+    for name, value in results["stages"].items():
+        print(f"  {name:<28}{value:10.2f}{compare(value, baseline.get('stages', {}).get(name))}")
+    for mode, app_results in results["app"].items():
+        app_baseline = baseline.get("app", {}).get(mode, {})
+        rps = app_results["requests_per_sec"]
+        print(f"\nApp, {mode}: {rps:,.0f} requests/sec{compare(rps, app_baseline.get('requests_per_sec'), True)}")
+        print(f"  {'span':<36}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+        for name, stats in sorted(app_results["stages"].items()):
+            p50 = compare(stats["p50"], app_baseline.get("stages", {}).get(name, {}).get("p50"))
+            print(f"  {name:<36}{stats['mean']:10.1f}{stats['p50']:10.1f}{stats['p99']:10.1f}{p50}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwks = {"keys": [to_jwk(private_key, KID)]}
+    claims = make_claims(make_settings(), args.institutions)
+    token = jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": KID})
+
+    return {
+        "stages": await bench_stages(token, jwks, claims, args.number),
+        "app": {
+            mode: await bench_app(token, jwks, args.requests, args.concurrency, claims_cache)
+            for mode, claims_cache in (("no claims cache", False), ("claims cache", True))
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2_000, help="calls per stage measurement")
+    parser.add_argument("--requests", type=int, default=2_000, help="requests per app measurement")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent requests")
+    parser.add_argument("--institutions", type=int, default=2, help="institutions in the token")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results of an earlier run")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
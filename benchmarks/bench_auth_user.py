@@ -0,0 +1,39 @@
+"""
+Micro-benchmark of AuthenticatedUser construction from verified token claims,
+comparing the validated and the validation free `from_claim` paths.
+
+Run with `poetry run python benchmarks/bench_auth_user.py`.
+"""
+
+import timeit
+
+from regtech_api_commons.models.auth import AuthenticatedUser
+
+
+def make_claims(institution_count: int) -> dict:
+    return {
+        "name": "Test User",
+        "preferred_username": "test_user",
+        "email": "test@local.host",
+        "sub": "testuser123",
+        "institutions": [f"/BENCHLEI{i:011d}" for i in range(institution_count)],
+    }
+
+
+def time_call(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1_000_000
+
+
+def main(number: int = 50_000) -> None:
+    for institution_count in (2, 200):
+        claims = make_claims(institution_count)
+        validated = time_call(lambda: AuthenticatedUser.from_claim(claims), number)
+        verified = time_call(lambda: AuthenticatedUser.from_claim(claims, validate=False), number)
+        print(
+            f"{institution_count:>4} institutions: validate=True {validated:7.2f} us/call, "
+            f"validate=False {verified:7.2f} us/call, speedup {validated / verified:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Sequence
+
+from fastapi import FastAPI, Request
+from fastapi.security import OAuth2AuthorizationCodeBearer
+from starlette.middleware.authentication import AuthenticationMiddleware
+
+from regtech_api_commons.api.exception_handlers import ErrorLogPolicy, register_exception_handlers
+from regtech_api_commons.api.http_client import SharedHttpClient, shared_http_client
+from regtech_api_commons.api.readiness import ReadinessMonitor
+from regtech_api_commons.oauth2.config import KeycloakSettings
+from regtech_api_commons.oauth2.async_oauth2_admin import AsyncOAuth2Admin
+from regtech_api_commons.oauth2.oauth2_admin import OAuth2Admin
+from regtech_api_commons.oauth2.oauth2_backend import DEFAULT_SCOPE_CLAIMS, BearerTokenAuthBackend
+
+log = logging.getLogger(__name__)
+
+
+def install(
+    app: FastAPI,
+    kc_settings: KeycloakSettings | None = None,
+    oauth2_admin: OAuth2Admin | AsyncOAuth2Admin | None = None,
+    http_client: SharedHttpClient = shared_http_client,
+    log_policy: ErrorLogPolicy | None = None,
+    scope_claims: Sequence[Sequence[str]] = DEFAULT_SCOPE_CLAIMS,
+    warm_jwks: bool = True,
+    readiness: ReadinessMonitor | None = None,
+) -> OAuth2Admin | AsyncOAuth2Admin:
+    """
+    Wire the library into an app: exception handlers, bearer token authentication, and the lifecycle of
+    the shared clients and caches.
+
+    A single OAuth2Admin, with its signing key, claims, user and group caches, is kept for the life of the app
+    in `app.state.oauth2_admin`, see `get_oauth2_admin`.  The app's lifespan is wrapped so the signing keys are
+    fetched at startup, and the admin's and the shared HTTP client's connections are closed at shutdown.
+
+    Args:
+        app(FastAPI): the app to install into, before it is started
+        kc_settings(KeycloakSettings): settings for the OAuth2Admin, loaded from env vars when neither these
+            nor `oauth2_admin` are given
+        oauth2_admin(OAuth2Admin | AsyncOAuth2Admin): use this admin instead of creating one
+        http_client(SharedHttpClient): shared client closed at shutdown, as used by the `api.dependencies`
+        log_policy(ErrorLogPolicy): how handled errors are logged
+        scope_claims(Sequence[Sequence[str]]): claim paths mapped to the request's scopes
+        warm_jwks(bool): fetch the signing keys at startup
+        readiness(ReadinessMonitor): monitor to run the readiness probes of while the app is up
+
+    Returns:
+        OAuth2Admin | AsyncOAuth2Admin: the app's admin
+    """
+    if oauth2_admin is None:
+        kc_settings = kc_settings or KeycloakSettings()
+        oauth2_admin = OAuth2Admin(kc_settings)
+    else:
+        kc_settings = oauth2_admin.kc_settings
+    token_bearer = OAuth2AuthorizationCodeBearer(
+        authorizationUrl=kc_settings.auth_url.unicode_string(), tokenUrl=kc_settings.token_url.unicode_string()
+    )
+    app.state.oauth2_admin = oauth2_admin
+    app.state.token_bearer = token_bearer
+
+    register_exception_handlers(app, log_policy=log_policy)
+    app.add_middleware(
+        AuthenticationMiddleware, backend=BearerTokenAuthBackend(token_bearer, oauth2_admin, scope_claims=scope_claims)
+    )
+
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[Any]:
+        if warm_jwks:
+            key_count = await oauth2_admin.awarm_keys()
+            log.info("Loaded %d signing keys", key_count)
+        if readiness is not None:
+            readiness.start()
+        try:
+            async with app_lifespan(app) as state:
+                yield state
+        finally:
+            if readiness is not None:
+                await readiness.stop()
+            await oauth2_admin.aclose()
+            await http_client.aclose()
+
+    app.router.lifespan_context = lifespan
+    return oauth2_admin
+
+
+def create_app(
+    kc_settings: KeycloakSettings | None = None,
+    oauth2_admin: OAuth2Admin | AsyncOAuth2Admin | None = None,
+    **fastapi_kwargs: Any,
+) -> FastAPI:
+    """
+    Create a FastAPI app with the library installed, see `install`.
+
+    Args:
+        kc_settings(KeycloakSettings): settings for the app's OAuth2Admin
+        oauth2_admin(OAuth2Admin | AsyncOAuth2Admin): use this admin instead of creating one
+        fastapi_kwargs: passed on to FastAPI, e.g. `lifespan` for the service's own startup and shutdown
+    """
+    app = FastAPI(**fastapi_kwargs)
+    install(app, kc_settings=kc_settings, oauth2_admin=oauth2_admin)
+    return app
+
+
+def get_oauth2_admin(request: Request) -> OAuth2Admin | AsyncOAuth2Admin:
+    """
+    Dependency providing the app's OAuth2Admin or AsyncOAuth2Admin installed by `install`.
+    """
+    return request.app.state.oauth2_admin
@@ -0,0 +1,53 @@
+from typing import FrozenSet, Iterable
+
+from pydantic_settings import BaseSettings
+from starlette.authentication import AuthCredentials
+
+
+class AuthorizationSettings(BaseSettings):
+    admin_scopes: str = "query-groups,manage-users"
+
+
+def scope_set(auth: AuthCredentials) -> FrozenSet[str]:
+    """
+    Set view of the credentials' scopes, reusing a precomputed `scope_set` when the credentials provide one.
+    """
+    scopes = getattr(auth, "scope_set", None)
+    return scopes if scopes is not None else frozenset(auth.scopes)
+
+
+class AuthorizationPolicy:
+    """
+    Authorization rules evaluated by the API dependencies, loaded once instead of on every request.
+    """
+
+    def __init__(self, admin_scopes: Iterable[str]) -> None:
+        self.admin_scopes = frozenset(scope.strip() for scope in admin_scopes if scope.strip())
+
+    @classmethod
+    def from_settings(cls, settings: AuthorizationSettings | None = None) -> "AuthorizationPolicy":
+        settings = settings or AuthorizationSettings()
+        return cls(settings.admin_scopes.split(","))
+
+    def is_admin(self, auth: AuthCredentials) -> bool:
+        # without configured admin scopes nobody is an admin, rather than everybody
+        return bool(self.admin_scopes) and self.admin_scopes <= scope_set(auth)
+
+
+_policy: AuthorizationPolicy | None = None
+
+
+def get_authorization_policy() -> AuthorizationPolicy:
+    global _policy
+    if _policy is None:
+        _policy = AuthorizationPolicy.from_settings()
+    return _policy
+
+
+def reload_authorization_policy(policy: AuthorizationPolicy | None = None) -> AuthorizationPolicy:
+    """
+    Replace the active policy, with the given one or one freshly loaded from settings, e.g. after changing env vars.
+    """
+    global _policy
+    _policy = policy or AuthorizationPolicy.from_settings()
+    return _policy
@@ -1,47 +1,148 @@
-import os
+import asyncio
 from http import HTTPStatus
 from itertools import chain
-from typing import List
+from typing import Dict, List
 
-import httpx
 from fastapi import Depends, Query, Request
 from starlette.authentication import AuthCredentials
 
+from regtech_api_commons.api.authorization import get_authorization_policy
 from regtech_api_commons.api.exceptions import RegTechHttpException
+from regtech_api_commons.api.http_client import SharedHttpClient, shared_http_client
+from regtech_api_commons.api.lei_status import LeiStatusCache
 from regtech_api_commons.models.auth import AuthenticatedUser
-
-
-def verify_lei(inst_api_url: str):
-    def lei_active_check(request: Request, lei: str) -> None:
-        res = httpx.get(inst_api_url + lei, headers={"authorization": request.headers["authorization"]})
-        lei_obj = res.json()
-        if not lei_obj["is_active"]:
-            raise RegTechHttpException(
-                status_code=HTTPStatus.FORBIDDEN, name="Request Forbidden", detail=f"LEI {lei} is in an inactive state."
-            )
+from regtech_api_commons.observability.metrics import INSTITUTIONS_API_SECONDS
+from regtech_api_commons.observability.tracing import span
+
+
+def verify_lei(
+    inst_api_url: str, http_client: SharedHttpClient = shared_http_client, status_cache: LeiStatusCache | None = None
+):
+    async def lei_active_check(request: Request, lei: str) -> None:
+        with span("regtech.verify_lei", {"lei": lei}):
+            authorization = request.headers["authorization"]
+            if status_cache is None:
+                is_active = await fetch_lei_status(http_client, inst_api_url, lei, authorization)
+            else:
+                is_active = await status_cache.get_or_fetch(
+                    lei, lambda: fetch_lei_status(http_client, inst_api_url, lei, authorization)
+                )
+            if not is_active:
+                raise RegTechHttpException(
+                    status_code=HTTPStatus.FORBIDDEN,
+                    name="Request Forbidden",
+                    detail=f"LEI {lei} is in an inactive state.",
+                )
 
     return lei_active_check
 
 
-def verify_user_lei_relation(request: Request, lei: str | None = None) -> None:
-    if lei:
-        user: AuthenticatedUser = request.user
-        auth: AuthCredentials = request.auth
-        detail = "Unauthenticated Request Forbidden."
-        if user.is_authenticated:
-            if is_admin(auth) or lei in user.institutions:
+def verify_leis(
+    inst_api_url: str,
+    http_client: SharedHttpClient = shared_http_client,
+    status_cache: LeiStatusCache | None = None,
+    bulk_url: str | None = None,
+    max_concurrency: int = 10,
+):
+    """
+    Batch version of `verify_lei` for endpoints taking a list of LEIs, as parsed by `parse_leis`.
+
+    Args:
+        inst_api_url(str): institutions API url the LEI is appended to, used to look up LEIs one at a time
+        http_client(SharedHttpClient): client used to call the institutions API
+        status_cache(LeiStatusCache | None): optional cache of LEI active states
+        bulk_url(str | None): institutions API url accepting a comma separated `leis` query parameter,
+            and returning a list of institutions.  When set, all uncached LEIs are looked up with a single request,
+            LEIs missing from the response are treated as inactive.
+        max_concurrency(int): max concurrent institutions API calls when looking up LEIs one at a time
+
+    Returns:
+        dependency raising a single RegTechHttpException listing every inactive LEI
+    """
+
+    async def leis_active_check(request: Request, leis: List[str] | None = Depends(parse_leis)) -> None:
+        with span("regtech.verify_leis"):
+            leis = list(dict.fromkeys(filter(None, leis or [])))
+            if not leis:
                 return
+            authorization = request.headers["authorization"]
+            if bulk_url:
+                statuses = await fetch_lei_statuses_bulk(http_client, bulk_url, leis, authorization, status_cache)
             else:
-                detail = f"LEI {lei} is not associated with the user."
-        raise RegTechHttpException(
-            status_code=HTTPStatus.FORBIDDEN,
-            name="Request Forbidden",
-            detail=detail,
-        )
+                semaphore = asyncio.Semaphore(max_concurrency)
+
+                async def check(lei: str) -> bool:
+                    async with semaphore:
+                        if status_cache is None:
+                            return await fetch_lei_status(http_client, inst_api_url, lei, authorization)
+                        return await status_cache.get_or_fetch(
+                            lei, lambda: fetch_lei_status(http_client, inst_api_url, lei, authorization)
+                        )
+
+                statuses = dict(zip(leis, await asyncio.gather(*[check(lei) for lei in leis])))
+            inactive_leis = [lei for lei in leis if not statuses.get(lei)]
+            if inactive_leis:
+                raise RegTechHttpException(
+                    status_code=HTTPStatus.FORBIDDEN,
+                    name="Request Forbidden",
+                    detail=f"LEIs ({inactive_leis}) are in an inactive state.",
+                )
+
+    return leis_active_check
+
+
+async def fetch_lei_status(http_client: SharedHttpClient, inst_api_url: str, lei: str, authorization: str) -> bool:
+    with span("regtech.institutions_api", {"endpoint": "lei"}), INSTITUTIONS_API_SECONDS.time(endpoint="lei"):
+        res = await http_client.client.get(inst_api_url + lei, headers={"authorization": authorization})
+        res.raise_for_status()
+        return res.json()["is_active"]
+
+
+async def fetch_lei_statuses_bulk(
+    http_client: SharedHttpClient,
+    bulk_url: str,
+    leis: List[str],
+    authorization: str,
+    status_cache: LeiStatusCache | None = None,
+) -> Dict[str, bool]:
+    statuses = {}
+    if status_cache is not None:
+        statuses = {lei: is_active for lei in leis if (is_active := status_cache.get(lei)) is not None}
+    uncached_leis = [lei for lei in leis if lei not in statuses]
+    if uncached_leis:
+        with span("regtech.institutions_api", {"endpoint": "bulk"}), INSTITUTIONS_API_SECONDS.time(endpoint="bulk"):
+            res = await http_client.client.get(
+                bulk_url, params={"leis": ",".join(uncached_leis)}, headers={"authorization": authorization}
+            )
+            res.raise_for_status()
+            fetched = {lei_obj["lei"]: lei_obj["is_active"] for lei_obj in res.json()}
+        if status_cache is not None:
+            for lei, is_active in fetched.items():
+                status_cache.set(lei, is_active)
+        statuses.update(fetched)
+    return statuses
 
 
-def is_admin(auth: AuthCredentials):
-    return all(scope in auth.scopes for scope in os.getenv("ADMIN_SCOPES", "query-groups,manage-users").split(","))
+def verify_user_lei_relation(request: Request, lei: str | None = None) -> None:
+    with span("regtech.verify_user_lei_relation"):
+        if lei:
+            user: AuthenticatedUser = request.user
+            auth: AuthCredentials = request.auth
+            detail = "Unauthenticated Request Forbidden."
+            if user.is_authenticated:
+                if is_admin(auth) or lei in user.institution_set:
+                    return
+                else:
+                    detail = f"LEI {lei} is not associated with the user."
+            raise RegTechHttpException(
+                status_code=HTTPStatus.FORBIDDEN,
+                name="Request Forbidden",
+                detail=detail,
+            )
+
+
+def is_admin(auth: AuthCredentials) -> bool:
+    return get_authorization_policy().is_admin(auth)
 
 
 def get_email_domain(email: str) -> str | None:
@@ -51,7 +152,7 @@ def get_email_domain(email: str) -> str | None:
 
 
 def verify_lei_search(user: AuthenticatedUser, leis: List[str]) -> None:
-    if not set(filter(len, leis)).issubset(set(filter(len, user.institutions))):
+    if not user.institution_set.issuperset(filter(None, leis)):
         raise RegTechHttpException(
             HTTPStatus.FORBIDDEN,
             name="Request Forbidden",
@@ -86,22 +187,23 @@ def parse_leis(leis: List[str] | None = Query(None)) -> List[str] | None:
 def verify_institution_search(
     request: Request, leis: List[str] | None = Depends(parse_leis), domain: str | None = None
 ) -> None:
-    user: AuthenticatedUser = request.user
-    auth: AuthCredentials = request.auth
-    detail = "Unauthenticated Request Forbidden."
-    if user.is_authenticated:
-        if is_admin(auth):
-            return
-        if leis:
-            verify_lei_search(user, leis)
-            return
-        elif domain:
-            verify_domain_search(user, domain)
-            return
-        elif not leis and not domain:
-            detail = "Retrieving institutions without filter is forbidden."
-    raise RegTechHttpException(
-        HTTPStatus.FORBIDDEN,
-        name="Request Forbidden",
-        detail=detail,
-    )
+    with span("regtech.verify_institution_search"):
+        user: AuthenticatedUser = request.user
+        auth: AuthCredentials = request.auth
+        detail = "Unauthenticated Request Forbidden."
+        if user.is_authenticated:
+            if is_admin(auth):
+                return
+            if leis:
+                verify_lei_search(user, leis)
+                return
+            elif domain:
+                verify_domain_search(user, domain)
+                return
+            elif not leis and not domain:
+                detail = "Retrieving institutions without filter is forbidden."
+        raise RegTechHttpException(
+            HTTPStatus.FORBIDDEN,
+            name="Request Forbidden",
+            detail=detail,
+        )
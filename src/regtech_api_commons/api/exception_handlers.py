@@ -1,39 +1,205 @@
 from http import HTTPStatus
 import logging
+import random
+import time
+from typing import Any, Callable, Dict, Hashable, List, Literal
+from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
+from pydantic_settings import BaseSettings
 from starlette.responses import JSONResponse
 from starlette.requests import Request
 from starlette.exceptions import HTTPException
 
 from regtech_api_commons.api.exceptions import RegTechHttpException
+from regtech_api_commons.api.responses import FastJSONResponse
+from regtech_api_commons.observability.metrics import EXCEPTION_HANDLER_RESPONSES
+from regtech_api_commons.utils.cache import TTLCache
 
 log = logging.getLogger(__name__)
 
 ERROR_NAME = "error_name"
 ERROR_DETAIL = "error_detail"
+ERROR_COUNT = "error_count"
+
+
+class ExceptionHandlerSettings(BaseSettings):
+    """
+    `string` validation error details keep the previous format, the stringified list of errors;
+    `structured` details are a list of {"type", "loc", "msg"} objects, capped at `validation_error_limit`
+    with the total number of errors reported in `error_count`.
+    """
+
+    validation_error_detail: Literal["string", "structured"] = "string"
+    validation_error_limit: int = 100
+
+
+_settings: ExceptionHandlerSettings | None = None
+
+
+def get_exception_handler_settings() -> ExceptionHandlerSettings:
+    global _settings
+    if _settings is None:
+        _settings = ExceptionHandlerSettings()
+    return _settings
+
+
+def reload_exception_handler_settings(settings: ExceptionHandlerSettings | None = None) -> ExceptionHandlerSettings:
+    """
+    Replace the active settings, with the given ones or freshly loaded ones, e.g. after changing env vars.
+    """
+    global _settings
+    _settings = settings or ExceptionHandlerSettings()
+    return _settings
+
+
+class ErrorLogPolicy:
+    """
+    Decides how handled errors are logged, based on their status class.
+
+    Server errors (5xx) are always logged with their traceback.  Client errors (4xx) are routine,
+    e.g. forbidden LEI access or scanners probing for paths, so by default they are logged without
+    a traceback, optionally only for a `client_error_sample_rate` fraction of them, and identical
+    ones at most once per `rate_limit_interval` seconds, with the number of suppressed repeats
+    reported on the next one logged.
+    """
+
+    def __init__(
+        self,
+        client_error_level: int = logging.WARNING,
+        client_error_traceback: bool = False,
+        client_error_sample_rate: float = 1.0,
+        rate_limit_interval: float = 60.0,
+        rate_limit_size: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+        sampler: Callable[[], float] = random.random,
+    ) -> None:
+        self.client_error_level = client_error_level
+        self.client_error_traceback = client_error_traceback
+        self.client_error_sample_rate = client_error_sample_rate
+        self.rate_limit_interval = rate_limit_interval
+        self._clock = clock
+        self._sampler = sampler
+        # key -> (time last logged, repeats suppressed since)
+        self._last_logged: TTLCache[Hashable, tuple] = TTLCache(rate_limit_size)
+
+    def log(
+        self, message: str, status_code: int, exception: Exception, detail: str | None = None, key: Hashable = None
+    ) -> None:
+        """
+        Log a handled error according to the policy.
+
+        Args:
+            message(str): log message
+            status_code(int): status of the error response
+            exception(Exception): the handled exception, logged with its traceback where the policy says so
+            detail(str): summary of the error for the log line, defaults to the exception text
+            key(Hashable): identifies repeats of the same error, defaults to the status and detail
+        """
+        if status_code >= 500:
+            log.exception(message, exc_info=exception)
+            return
+        if self.client_error_sample_rate < 1.0 and self._sampler() >= self.client_error_sample_rate:
+            return
+        detail = str(exception) if detail is None else detail
+        suppressed = 0
+        if self.rate_limit_interval > 0:
+            key = (status_code, type(exception), detail) if key is None else key
+            now = self._clock()
+            entry = self._last_logged.get(key)
+            if entry is not None:
+                last_logged, suppressed = entry
+                if now - last_logged < self.rate_limit_interval:
+                    self._last_logged.set(key, (last_logged, suppressed + 1))
+                    return
+            self._last_logged.set(key, (now, 0))
+        exc_info = exception if self.client_error_traceback else None
+        if suppressed:
+            log.log(
+                self.client_error_level,
+                "%s %s (%d similar suppressed)",
+                message,
+                detail,
+                suppressed,
+                exc_info=exc_info,
+            )
+        else:
+            log.log(self.client_error_level, "%s %s", message, detail, exc_info=exc_info)
+
+
+_log_policy = ErrorLogPolicy()
+
+
+def get_error_log_policy() -> ErrorLogPolicy:
+    return _log_policy
+
+
+def set_error_log_policy(policy: ErrorLogPolicy) -> None:
+    global _log_policy
+    _log_policy = policy
+
+
+def register_exception_handlers(app: FastAPI, log_policy: ErrorLogPolicy | None = None) -> None:
+    """
+    Register the handlers below on the app.
+
+    Args:
+        app(FastAPI): the app to register the handlers on
+        log_policy(ErrorLogPolicy): how the handled errors are logged, the handlers share one policy per process
+    """
+    if log_policy is not None:
+        set_error_log_policy(log_policy)
+    app.add_exception_handler(RegTechHttpException, regtech_http_exception_handler)
+    app.add_exception_handler(RequestValidationError, request_validation_error_handler)
+    app.add_exception_handler(HTTPException, http_exception_handler)
+    app.add_exception_handler(Exception, general_exception_handler)
+
+
+def structured_errors(errors: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """
+    Reduce validation errors to their JSON safe type, location and message, keeping at most `limit` of them.
+    The erroneous input and context are left out, they can be as large as the request body.
+    """
+    return [{"type": e.get("type"), "loc": e.get("loc"), "msg": e.get("msg")} for e in errors[: max(limit, 0)]]
 
 
 async def regtech_http_exception_handler(request: Request, exception: RegTechHttpException) -> JSONResponse:
-    log.exception("Handling RegTechHttpException.")
+    _log_policy.log("Handling RegTechHttpException.", exception.status_code, exception)
+    EXCEPTION_HANDLER_RESPONSES.inc(handler="regtech_http_exception", status=exception.status_code)
     detail = exception.detail if exception.show_raw_detail else str(exception.detail)
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exception.status_code,
         content={ERROR_NAME: exception.name, ERROR_DETAIL: detail},
     )
 
 
 async def request_validation_error_handler(request: Request, exception: RequestValidationError) -> JSONResponse:
-    log.warning("Handling RequestValidationError.", exc_info=True)
-    return JSONResponse(
-        status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
-        content={ERROR_NAME: "Request Validation Failure", ERROR_DETAIL: str(exception.errors())},
+    EXCEPTION_HANDLER_RESPONSES.inc(handler="request_validation_error", status=HTTPStatus.UNPROCESSABLE_ENTITY.value)
+    settings = get_exception_handler_settings()
+    errors = exception.errors()
+    # keyed on the error locations, the text of a validation error includes the rejected input
+    _log_policy.log(
+        "Handling RequestValidationError.",
+        HTTPStatus.UNPROCESSABLE_ENTITY,
+        exception,
+        detail=f"{len(errors)} validation errors",
+        key=(HTTPStatus.UNPROCESSABLE_ENTITY, tuple(str(e.get("loc")) for e in errors[:10])),
     )
+    if settings.validation_error_detail == "structured":
+        content = {
+            ERROR_NAME: "Request Validation Failure",
+            ERROR_DETAIL: structured_errors(errors, settings.validation_error_limit),
+            ERROR_COUNT: len(errors),
+        }
+    else:
+        content = {ERROR_NAME: "Request Validation Failure", ERROR_DETAIL: str(errors)}
+    return FastJSONResponse(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, content=content)
 
 
 async def http_exception_handler(request: Request, exception: HTTPException) -> JSONResponse:
-    log.exception("Handling HTTPException.")
+    _log_policy.log("Handling HTTPException.", exception.status_code, exception)
+    EXCEPTION_HANDLER_RESPONSES.inc(handler="http_exception", status=exception.status_code)
     status = HTTPStatus(exception.status_code)
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exception.status_code,
         content={ERROR_NAME: status.phrase, ERROR_DETAIL: str(exception.detail)},
     )
@@ -41,7 +207,8 @@ async def http_exception_handler(request: Request, exception: HTTPException) ->
 
 async def general_exception_handler(request: Request, exception: Exception) -> JSONResponse:
     log.exception("Handling General Exception.")
-    return JSONResponse(
+    EXCEPTION_HANDLER_RESPONSES.inc(handler="general_exception", status=HTTPStatus.INTERNAL_SERVER_ERROR.value)
+    return FastJSONResponse(
         status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
         content={ERROR_NAME: HTTPStatus.INTERNAL_SERVER_ERROR.phrase, ERROR_DETAIL: "server error"},
     )
@@ -0,0 +1,66 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import httpx
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class HttpClientSettings(BaseSettings):
+    """
+    Connection settings for the shared HTTP client, loaded from `HTTP_CLIENT_` prefixed env vars.
+    HTTP/2 needs the `h2` package, e.g. `pip install httpx[http2]`.
+    """
+
+    timeout: float = 10.0
+    connect_timeout: float = 5.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 5.0
+    http2: bool = False
+
+    model_config = SettingsConfigDict(env_prefix="http_client_")
+
+
+class SharedHttpClient:
+    """
+    Process wide `httpx.AsyncClient` holder, so calls to upstream services reuse pooled keep-alive connections.
+
+    The client is created on first use, and should be closed on application shutdown,
+    e.g. by passing `lifespan` to FastAPI, or calling `aclose` from an existing lifespan.
+    """
+
+    def __init__(self, settings: HttpClientSettings | None = None, **client_kwargs: Any) -> None:
+        self._settings = settings
+        self._client_kwargs = client_kwargs
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            settings = self._settings or HttpClientSettings()
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.timeout, connect=settings.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=settings.max_connections,
+                    max_keepalive_connections=settings.max_keepalive_connections,
+                    keepalive_expiry=settings.keepalive_expiry,
+                ),
+                http2=settings.http2,
+                **self._client_kwargs,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any = None) -> AsyncIterator[None]:
+        try:
+            yield
+        finally:
+            await self.aclose()
+
+
+shared_http_client = SharedHttpClient()
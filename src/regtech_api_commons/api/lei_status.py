@@ -0,0 +1,77 @@
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+from regtech_api_commons.utils.cache import TTLCache
+
+
+class LeiStatusCache:
+    """
+    In-process cache of LEI active states, used by `verify_lei` to avoid calling the institutions API on every request.
+
+    Active and inactive results are kept for separate durations, so an institution being reactivated
+    is picked up sooner than one being deactivated, or vice versa.  Concurrent lookups of the same
+    uncached LEI are coalesced into a single upstream call.
+    """
+
+    def __init__(self, maxsize: int = 1024, active_ttl: float = 300, inactive_ttl: float = 60) -> None:
+        self.active_ttl = active_ttl
+        self.inactive_ttl = inactive_ttl
+        self._cache: TTLCache[str, bool] = TTLCache(maxsize)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def cache(self) -> TTLCache[str, bool]:
+        return self._cache
+
+    async def get_or_fetch(self, lei: str, fetch: Callable[[], Awaitable[bool]]) -> bool:
+        """
+        Get the cached active state of the LEI, or fetch it, sharing the fetch with any concurrent lookups.
+
+        Args:
+            lei(str): LEI to look up
+            fetch(Callable[[], Awaitable[bool]]): retrieves the active state from the institutions API
+
+        Returns:
+            bool: whether the LEI is active
+        """
+        is_active = self.get(lei)
+        if is_active is not None:
+            return is_active
+        future = self._in_flight.get(lei)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(lei, fetch))
+            self._in_flight[lei] = future
+            future.add_done_callback(lambda done: self._fetch_done(lei, done))
+        # shielded so a cancelled request does not cancel the lookup other requests are waiting on
+        return await asyncio.shield(future)
+
+    async def _fetch(self, lei: str, fetch: Callable[[], Awaitable[bool]]) -> bool:
+        is_active = await fetch()
+        # not cached when the LEI was invalidated while fetching, the result may predate the change
+        if self._in_flight.get(lei) is asyncio.current_task():
+            self.set(lei, is_active)
+        return is_active
+
+    def get(self, lei: str) -> bool | None:
+        return self._cache.get(lei)
+
+    def set(self, lei: str, is_active: bool) -> None:
+        self._cache.set(lei, is_active, ttl=self.active_ttl if is_active else self.inactive_ttl)
+
+    def _fetch_done(self, lei: str, future: asyncio.Future) -> None:
+        # the entry may already have been replaced by a fetch started after an invalidation
+        if self._in_flight.get(lei) is future:
+            del self._in_flight[lei]
+
+    def invalidate(self, lei: str) -> None:
+        """
+        Drop the cached state of a single LEI, e.g. after its active state was changed.
+
+        A lookup already in flight still completes for its waiters, but its result is not cached.
+        """
+        self._cache.invalidate(lei)
+        self._in_flight.pop(lei, None)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._in_flight.clear()
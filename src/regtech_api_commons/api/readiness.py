@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict
+
+from pydantic import BaseModel
+
+from regtech_api_commons.api.http_client import SharedHttpClient, shared_http_client
+
+if TYPE_CHECKING:
+    from regtech_api_commons.oauth2.oauth2_admin import BaseOAuth2Admin
+
+log = logging.getLogger(__name__)
+
+Probe = Callable[[], Awaitable[Any]]
+
+
+class ProbeResult(BaseModel):
+    ok: bool
+    detail: str | None = None
+    checked_at: datetime
+    duration: float
+
+
+class ReadinessMonitor:
+    """
+    Probes the service's dependencies in the background every `interval` seconds, and keeps the latest results,
+    so readiness checks are answered from memory without adding latency or load to the dependencies.
+
+    A probe is a coroutine function that raises, or times out after `timeout` seconds, when its dependency
+    is unavailable.  The service is ready once every probe has succeeded on its latest run.  Probing starts
+    with `start`, or `lifespan`, and is also done by `install` when given the monitor.
+    """
+
+    def __init__(self, interval: float = 15, timeout: float = 5) -> None:
+        self.interval = interval
+        self.timeout = timeout
+        self._probes: Dict[str, Probe] = {}
+        self._results: Dict[str, ProbeResult] = {}
+        self._task: asyncio.Task | None = None
+
+    def add_probe(self, name: str, probe: Probe) -> None:
+        self._probes[name] = probe
+
+    @property
+    def results(self) -> Dict[str, ProbeResult]:
+        return dict(self._results)
+
+    @property
+    def ready(self) -> bool:
+        return all(name in self._results and self._results[name].ok for name in self._probes)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "not ready",
+            "checks": {name: result.model_dump(mode="json") for name, result in self._results.items()},
+        }
+
+    async def check(self) -> Dict[str, ProbeResult]:
+        """
+        Run all probes concurrently, storing their results.
+
+        Returns:
+            Dict[str, ProbeResult]: the results by probe name
+        """
+        names = list(self._probes)
+        results = await asyncio.gather(*[self._run_probe(name, self._probes[name]) for name in names])
+        self._results.update(zip(names, results))
+        return dict(zip(names, results))
+
+    async def _run_probe(self, name: str, probe: Probe) -> ProbeResult:
+        checked_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe(), self.timeout)
+            return ProbeResult(ok=True, checked_at=checked_at, duration=time.perf_counter() - start)
+        except Exception as e:
+            log.warning("Readiness probe %s failed: %r", name, e)
+            detail = "timed out" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+            return ProbeResult(ok=False, detail=detail, checked_at=checked_at, duration=time.perf_counter() - start)
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any = None) -> AsyncIterator[None]:
+        self.start()
+        try:
+            yield
+        finally:
+            await self.stop()
+
+
+def jwks_probe(oauth2_admin: "BaseOAuth2Admin") -> Probe:
+    """
+    Probe fetching the realm's signing keys, failing if Keycloak publishes none.
+    """
+
+    async def probe() -> None:
+        if not await oauth2_admin.aping_jwks():
+            raise ValueError("no signing keys published")
+
+    return probe
+
+
+def keycloak_admin_probe(oauth2_admin: "BaseOAuth2Admin") -> Probe:
+    """
+    Probe obtaining a Keycloak admin token with the admin client's credentials.
+    """
+    return oauth2_admin.aping_admin_token
+
+
+def http_probe(url: str, http_client: SharedHttpClient = shared_http_client) -> Probe:
+    """
+    Probe requesting the url, e.g. the institutions API, failing on connection errors and 5xx responses.
+    """
+
+    async def probe() -> None:
+        response = await http_client.client.get(url)
+        if response.status_code >= 500:
+            response.raise_for_status()
+
+    return probe
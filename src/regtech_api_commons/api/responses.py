@@ -0,0 +1,26 @@
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson when it is installed, through the `fast-json` extra,
+    e.g. `pip install regtech-api-commons[fast-json]`, falling back to the stdlib json encoder otherwise.
+
+    Values neither encoder can serialize natively, e.g. UUIDs in error details, are rendered with `str`,
+    and non string dict keys are converted to strings, as `JSONResponse` does.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=str
+        ).encode("utf-8")
@@ -2,17 +2,54 @@ from typing import Any, Callable
 
 from fastapi import APIRouter
 from fastapi.types import DecoratedCallable
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from regtech_api_commons.api.readiness import ReadinessMonitor
+from regtech_api_commons.api.responses import FastJSONResponse
+from regtech_api_commons.observability.metrics import CONTENT_TYPE, MetricsRegistry
 
 
 class Router(APIRouter):
+    """
+    APIRouter serving every route both with and without a trailing slash.
+
+    By default each route is registered twice.  With `duplicate_trailing_slash=False` each route is
+    registered once, without the trailing slash, and the app must strip trailing slashes before routing
+    with `TrailingSlashMiddleware`, which halves the route table that is matched on every request.
+
+    `/healthcheck` is the liveness check.  Given a `ReadinessMonitor`, `/readiness` serves its latest
+    results, with a 503 status until all of the monitored dependencies are available.  Given a
+    `MetricsRegistry`, e.g. `observability.metrics.registry`, `/metrics` serves it for Prometheus to scrape.
+    """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self,
+        *args,
+        duplicate_trailing_slash: bool = True,
+        readiness: ReadinessMonitor | None = None,
+        metrics: MetricsRegistry | None = None,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
+        self.duplicate_trailing_slash = duplicate_trailing_slash
 
         @self.get("/healthcheck")
         async def healthcheck():
             return "Service is up."
 
+        if readiness is not None:
+
+            @self.get("/readiness")
+            async def readiness_check():
+                return FastJSONResponse(status_code=200 if readiness.ready else 503, content=readiness.status())
+
+        if metrics is not None:
+
+            @self.get("/metrics", include_in_schema=False)
+            async def metrics_exposition():
+                return Response(metrics.render(), media_type=CONTENT_TYPE)
+
     def api_route(
         self, path: str, *, include_in_schema: bool = True, **kwargs: Any
     ) -> Callable[[DecoratedCallable], DecoratedCallable]:
@@ -20,6 +57,8 @@ class Router(APIRouter):
             path = path[:-1]
 
         add_path = super().api_route(path, include_in_schema=include_in_schema, **kwargs)
+        if not self.duplicate_trailing_slash:
+            return add_path
 
         add_alt_path = super().api_route(f"{path}/", include_in_schema=False, **kwargs)
 
@@ -28,3 +67,25 @@ class Router(APIRouter):
             return add_path(func)
 
         return decorator
+
+
+class TrailingSlashMiddleware:
+    """
+    ASGI middleware removing a single trailing slash from request paths, other than the root path, before routing.
+
+    Meant for apps whose routes are all registered without trailing slashes, e.g. with
+    `Router(duplicate_trailing_slash=False)`; a route registered with a trailing slash can not be reached.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            if len(path) > 1 and path.endswith("/"):
+                scope = {**scope, "path": path[:-1]}
+                raw_path = scope.get("raw_path")
+                if raw_path and raw_path.endswith(b"/"):
+                    scope["raw_path"] = raw_path[:-1]
+        await self.app(scope, receive, send)
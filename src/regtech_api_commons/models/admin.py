@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class LeiAssociationResult(BaseModel):
+    lei: str
+    group_id: str | None = None
+    group_created: bool = False
+    error: str | None = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
@@ -1,5 +1,5 @@
-from typing import List, Dict, Any
-from pydantic import BaseModel
+from typing import List, Dict, Any, FrozenSet, Mapping
+from pydantic import BaseModel, PrivateAttr
 from starlette.authentication import BaseUser
 
 
@@ -9,16 +9,74 @@ class RegTechUser(BaseModel):
     email: str
     id: str
     institutions: List[str]
+    _institution_set: FrozenSet[str] = PrivateAttr(default=frozenset())
+
+    def model_post_init(self, context: Any) -> None:
+        self._institution_set = self._to_set(self.institutions)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "institutions":
+            self._institution_set = self._to_set(self.institutions)
+
+    def model_copy(self, *, update: Mapping[str, Any] | None = None, deep: bool = False) -> "RegTechUser":
+        copy = super().model_copy(update=update, deep=deep)
+        if update and "institutions" in update:
+            copy._institution_set = self._to_set(copy.institutions)
+        return copy
+
+    @staticmethod
+    def _to_set(institutions: List[str]) -> FrozenSet[str]:
+        return frozenset(filter(None, institutions))
+
+    @property
+    def institution_set(self) -> FrozenSet[str]:
+        """
+        Set of the user's non-empty institutions, for constant time membership checks.
+
+        Built at construction, and rebuilt when `institutions` is reassigned or replaced through `model_copy`;
+        in place changes to the `institutions` list are not reflected.
+        """
+        return self._institution_set
 
     @classmethod
-    def from_claim(cls, claims: Dict[str, Any]) -> "RegTechUser":
-        return cls(
+    def from_claim(cls, claims: Dict[str, Any], validate: bool = True) -> "RegTechUser":
+        """
+        Create the user from token claims.
+
+        Args:
+            claims(Dict[str, Any]): token claims
+            validate(bool): run pydantic validation on the claim values, can be skipped for claims
+                that were just cryptographically verified; `benchmarks/bench_auth_user.py` measures about 1.6x
+                faster construction for claims with a few institutions, a gain that mostly disappears for
+                institution lists in the hundreds
+
+        Returns:
+            RegTechUser: user described by the claims
+        """
+        values = dict(
             name=claims.get("name", ""),
             username=claims.get("preferred_username", ""),
             email=claims.get("email", ""),
             id=claims.get("sub", ""),
             institutions=cls.parse_institutions(claims.get("institutions")),
         )
+        return cls(**values) if validate else cls._construct_verified(values)
+
+    @classmethod
+    def _construct_verified(cls, values: Dict[str, Any]) -> "RegTechUser":
+        """
+        Build the model from values known to be valid, without running validation.
+
+        Sets the same instance state as `model_construct`, minus its generic per field
+        default handling, which for this small model costs more than validating.
+        """
+        user = cls.__new__(cls)
+        object.__setattr__(user, "__dict__", values)
+        object.__setattr__(user, "__pydantic_fields_set__", set(values))
+        object.__setattr__(user, "__pydantic_extra__", None)
+        object.__setattr__(user, "__pydantic_private__", {"_institution_set": cls._to_set(values["institutions"])})
+        return user
 
     @classmethod
     def from_kc(cls, user: Dict[str, Any], groups: List[Dict[str, Any]]) -> "RegTechUser":
@@ -45,7 +103,7 @@ class RegTechUser(BaseModel):
             e.g. ["GRAND_CHILD_INSTITUTION"]
         """
         if institutions:
-            return [institution.split("/")[-1] for institution in institutions]
+            return [institution.rpartition("/")[2] for institution in institutions]
         else:
             return []
 
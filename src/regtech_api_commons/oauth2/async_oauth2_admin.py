@@ -0,0 +1,185 @@
+import asyncio
+import logging
+from http import HTTPStatus
+from typing import Any, Dict, Set
+
+from keycloak import exceptions as kce
+
+from regtech_api_commons.api.exceptions import RegTechHttpException
+from regtech_api_commons.models.admin import LeiAssociationResult
+from regtech_api_commons.models.auth import RegTechUser
+from regtech_api_commons.oauth2.oauth2_admin import BaseOAuth2Admin
+from regtech_regex.regex_config import RegexConfigs
+
+log = logging.getLogger(__name__)
+
+
+class AsyncOAuth2Admin(BaseOAuth2Admin):
+    """
+    Counterpart of OAuth2Admin with coroutine Keycloak admin methods, for use in async request handlers.
+
+    Admin calls go through python-keycloak's async API, sharing the connection's pooled
+    async HTTP client and admin token.  Token claims are verified the same way as in
+    OAuth2Admin, through `aget_claims` or `get_claims`.  Not a subclass of OAuth2Admin, as its admin
+    methods return coroutines where OAuth2Admin's return values.
+    """
+
+    async def get_user(self, user_id: str) -> RegTechUser:
+        cached_user = self._get_cached_user(user_id)
+        if cached_user is not None:
+            return cached_user
+        user, groups = await asyncio.gather(self._admin.a_get_user(user_id), self._admin.a_get_user_groups(user_id))
+        user = RegTechUser.from_kc(user, groups)
+        self._cache_user(user_id, user)
+        return user
+
+    async def update_user(self, user_id: str, payload: Dict[str, Any]) -> None:
+        try:
+            await self._admin.a_update_user(user_id, payload)
+            self.invalidate_user(user_id)
+        except kce.KeycloakError as e:
+            log.exception("Failed to update user: %s", user_id)
+            raise RegTechHttpException(status_code=e.response_code, detail="Failed to update user")
+
+    async def upsert_group(self, lei: str, name: str) -> str:
+        try:
+            try:
+                return await self._aupsert_group(lei)
+            except kce.KeycloakError as e:
+                if not self._invalidate_missing_group(lei, e.response_code):
+                    raise
+                # retried with a fresh lookup, creating the group if it is gone
+                return await self._aupsert_group(lei)
+        except kce.KeycloakError as e:
+            self._invalidate_missing_group(lei, e.response_code)
+            log.exception("Failed to upsert group, lei: %s, name: %s", lei, name)
+            raise RegTechHttpException(status_code=e.response_code, detail="Failed to upsert group")
+
+    async def _aupsert_group(self, lei: str) -> str:
+        group_payload = {"name": lei}
+        group_id = await self.get_group_id(lei)
+        if group_id is None:
+            group_id = await self._admin.a_create_group(group_payload)
+            self._cache_group_id(lei, group_id)
+        else:
+            await self._admin.a_update_group(group_id, group_payload)
+        return group_id
+
+    async def get_group(self, lei: str) -> Dict[str, Any] | None:
+        try:
+            group = await self._admin.a_get_group_by_path(f"/{lei}")
+            if group and "id" in group:
+                self._cache_group_id(lei, group["id"])
+                return group
+            else:
+                log.error(f"Unexpected results from get_group_by_path: {group}")
+                return None
+        except kce.KeycloakError:
+            return None
+
+    async def get_group_id(self, lei: str) -> str | None:
+        if self._group_cache is not None:
+            group_id = self._group_cache.get(lei)
+            if group_id is not None:
+                return group_id
+        group = await self.get_group(lei)
+        return group["id"] if group else None
+
+    async def preload_group_cache(self) -> int:
+        if self._group_cache is None:
+            return 0
+        try:
+            groups = await self._admin.a_get_groups({"briefRepresentation": True})
+        except kce.KeycloakError:
+            log.exception("Failed to preload group cache")
+            return 0
+        for group in groups:
+            self._cache_group_id(group["name"], group["id"])
+        return len(self._group_cache)
+
+    async def associate_to_group(self, user_id: str, group_id: str) -> None:
+        try:
+            await self._admin.a_group_user_add(user_id, group_id)
+            self.invalidate_user(user_id)
+        except kce.KeycloakError as e:
+            log.exception("Failed to associate user %s to group %s", user_id, group_id)
+            raise RegTechHttpException(status_code=e.response_code, detail="Failed to associate user to group")
+
+    async def associate_to_lei(self, user_id: str, lei: str) -> None:
+        regex_configs = RegexConfigs.instance()
+        if regex_configs.lei.regex.match(lei):
+            group_id = await self.get_group_id(lei)
+            if group_id is None:
+                group_id = await self._admin.a_create_group({"name": lei})
+                self._cache_group_id(lei, group_id)
+            if group_id:
+                try:
+                    await self.associate_to_group(user_id, group_id)
+                except RegTechHttpException as e:
+                    self._invalidate_missing_group(lei, e.status_code)
+                    raise
+        else:
+            raise ValueError(f"Invalid LEI {lei}. {regex_configs.lei.error_text}")
+
+    async def associate_to_leis(self, user_id: str, leis: Set[str]):
+        for lei in leis:
+            await self.associate_to_lei(user_id, lei)
+
+    async def bulk_associate_to_leis(self, user_id: str, leis: Set[str]) -> Dict[str, LeiAssociationResult]:
+        valid_leis, results = self._validate_leis(leis)
+        if not valid_leis:
+            return results
+
+        group_ids = self._cached_group_ids(valid_leis)
+        semaphore = asyncio.Semaphore(self._kc_settings.kc_admin_max_concurrency)
+
+        async def associate(lei: str) -> LeiAssociationResult:
+            async with semaphore:
+                return await self._associate_to_lei_group(user_id, lei, group_ids.get(lei))
+
+        for result in await asyncio.gather(*[associate(lei) for lei in valid_leis]):
+            results[result.lei] = result
+        self.invalidate_user(user_id)
+        return results
+
+    async def _associate_to_lei_group(self, user_id: str, lei: str, group_id: str | None) -> LeiAssociationResult:
+        result = LeiAssociationResult(lei=lei, group_id=group_id)
+        try:
+            if result.group_id is None:
+                group = await self._admin.a_get_group_by_path(f"/{lei}")
+                result.group_id = self._group_id_from_path_lookup(lei, group)
+            if result.group_id is None:
+                result.group_id = await self._admin.a_create_group({"name": lei}, skip_exists=True)
+                result.group_created = result.group_id is not None
+                self._cache_group_id(lei, result.group_id)
+                if result.group_id is None:
+                    # created concurrently by someone else
+                    result.group_id = await self.get_group_id(lei)
+            if result.group_id is None:
+                result.error = f"Failed to resolve group for LEI {lei}"
+            else:
+                await self._admin.a_group_user_add(user_id, result.group_id)
+        except kce.KeycloakError as e:
+            self._invalidate_missing_group(lei, e.response_code)
+            log.exception("Failed to associate user %s to lei %s", user_id, lei)
+            result.error = str(e)
+        return result
+
+    async def delete_group(self, lei: str) -> Dict[str, Any] | None:
+        try:
+            group_id = await self.get_group_id(lei)
+            if self._group_cache is not None:
+                self._group_cache.invalidate(lei)
+            if group_id is None:
+                raise RegTechHttpException(status_code=HTTPStatus.NOT_FOUND, detail="Group not found")
+            return await self._admin.a_delete_group(group_id)
+        except kce.KeycloakError as e:
+            log.exception("Failed to delete group, lei: %s", lei)
+            raise RegTechHttpException(status_code=e.response_code, detail="Failed to delete group")
+
+    async def aclose(self) -> None:
+        """
+        Close the async HTTP clients used for signing keys and Keycloak admin calls.
+        """
+        await super().aclose()
+        await self._admin.connection.aclose()
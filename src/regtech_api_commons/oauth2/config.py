@@ -18,6 +18,19 @@ class KeycloakSettings(BaseSettings):
     kc_admin_client_id: str | None = None
     kc_admin_client_secret: SecretStr | None = None
     kc_realm_url: HttpUrl | None = None
+    kc_admin_max_concurrency: int = 8
+    group_cache_size: int = 0
+    group_cache_ttl: int | None = None
+    user_cache_size: int = 0
+    user_cache_ttl: int = 30
+    jwks_ttl: int = 300
+    jwks_min_refresh_interval: int = 10
+    jwks_fetch_timeout: float = 5.0
+    jwks_snapshot_path: str | None = None
+    jwks_snapshot_max_age: int = 86400
+    claims_cache_size: int = 0
+    claims_cache_ttl: int = 300
+    claims_verify_in_threadpool: bool = False
     _jwt_opts: Dict[str, bool | int] = {}
 
     model_config = SettingsConfigDict(extra="allow")
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+import jwt
+
+log = logging.getLogger(__name__)
+
+
+class JwksKeyStore:
+    """
+    Signing keys from a JWKS document, indexed by key id (`kid`).
+
+    Every key is parsed into a `jwt.PyJWK` once when the JWKS is loaded,
+    so looking up the key for a token is a single dictionary access.
+    """
+
+    def __init__(self, jwks: Dict[str, Any] | None = None) -> None:
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        if jwks is not None:
+            self.load(jwks)
+
+    def load(self, jwks: Dict[str, Any]) -> None:
+        """
+        Parse the keys of a JWKS document, replacing the currently held keys.
+
+        Args:
+            jwks(Dict[str, Any]): JWKS document as returned by the certs endpoint, e.g. {"keys": [...]}
+        """
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            kid = jwk.get("kid")
+            if kid is None:
+                continue
+            try:
+                keys[kid] = jwt.PyJWK(jwk)
+            except (jwt.exceptions.PyJWKError, jwt.exceptions.InvalidKeyError):
+                # Keycloak also publishes encryption keys which are not usable for signature verification
+                log.debug("Skipping unusable JWK, kid: %s", kid)
+        self._keys = keys
+
+    def get(self, kid: str | None) -> jwt.PyJWK | None:
+        return self._keys.get(kid)
+
+    def __contains__(self, kid: str) -> bool:
+        return kid in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class JwksSnapshot:
+    """
+    On-disk copy of the last fetched JWKS, so a new process can verify tokens before, or without, reaching Keycloak.
+
+    The file is replaced atomically, and snapshots older than `max_age` seconds are ignored,
+    so keys Keycloak has since retired are not trusted indefinitely.
+    """
+
+    def __init__(self, path: str, max_age: float = 86400) -> None:
+        self.path = path
+        self.max_age = max_age
+        self._saved: Dict[str, Any] | None = None
+
+    def load(self) -> Dict[str, Any] | None:
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+            if age > self.max_age:
+                log.info("Ignoring JWKS snapshot %s, it is %ds old", self.path, age)
+                return None
+            with open(self.path) as f:
+                jwks = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            log.exception("Failed to load JWKS snapshot %s", self.path)
+            return None
+        self._saved = jwks
+        return jwks
+
+    def save(self, jwks: Dict[str, Any]) -> None:
+        if jwks == self._saved:
+            # still refresh the age of the snapshot
+            try:
+                os.utime(self.path)
+                return
+            except OSError:
+                pass
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".jwks-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(jwks, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            log.exception("Failed to save JWKS snapshot %s", self.path)
+            return
+        self._saved = jwks
+
+
+class JwksCache:
+    """
+    Cache of the realm's signing keys with time based and on demand refreshing.
+
+    Keys are refetched once they are older than `ttl` seconds, or when a token
+    references a kid that is not in the cache, which happens right after Keycloak
+    rotates its keys.  Fetches are single-flight, concurrent callers wait on the
+    in-flight fetch instead of issuing their own, and are throttled to at most one
+    per `min_refresh_interval` seconds so tokens with made up kids can not be used
+    to flood Keycloak with certs requests.
+
+    `get_key` fetches with the blocking `fetch` callable, `aget_key` with the
+    `afetch` coroutine function so the event loop is never blocked on Keycloak,
+    without `afetch` the blocking `fetch` is run in a worker thread.
+
+    With a `snapshot`, the keys are loaded from it on creation, and treated as stale,
+    so they are served while being revalidated, and every fetch is saved to it.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Dict[str, Any]],
+        ttl: float = 300,
+        min_refresh_interval: float = 10,
+        clock: Callable[[], float] = time.monotonic,
+        afetch: Callable[[], Awaitable[Dict[str, Any]]] | None = None,
+        snapshot: JwksSnapshot | None = None,
+    ) -> None:
+        self._fetch = fetch
+        self._afetch = afetch or (lambda: asyncio.to_thread(fetch))
+        self._ttl = ttl
+        self._min_refresh_interval = min_refresh_interval
+        self._clock = clock
+        self._store = JwksKeyStore()
+        self._fetched_at: float | None = None
+        self._last_attempt: float | None = None
+        self._lock = threading.Lock()
+        self._async_lock = asyncio.Lock()
+        self._revalidation: asyncio.Task | None = None
+        self._snapshot = snapshot
+        if snapshot is not None:
+            jwks = snapshot.load()
+            if jwks is not None:
+                self._store.load(jwks)
+                log.info("Loaded %d signing keys from JWKS snapshot %s", len(self._store), snapshot.path)
+
+    def get_key(self, kid: str | None) -> jwt.PyJWK | None:
+        """
+        Look up the signing key for the given kid, refreshing the keys if they are stale or the kid is unknown.
+
+        Returns:
+            jwt.PyJWK | None: the signing key, or None if no such key could be found
+        """
+        key = self._store.get(kid)
+        if key is None:
+            self._refresh(wait=True, kid=kid)
+            return self._store.get(kid)
+        if self.is_stale():
+            # serve the cached key while a single caller revalidates
+            self._refresh(wait=False)
+        return key
+
+    async def aget_key(self, kid: str | None) -> jwt.PyJWK | None:
+        """
+        Async counterpart of `get_key`, stale keys are revalidated in a background task.
+
+        Returns:
+            jwt.PyJWK | None: the signing key, or None if no such key could be found
+        """
+        key = self._store.get(kid)
+        if key is None:
+            await self._arefresh(kid=kid)
+            return self._store.get(kid)
+        if self.is_stale() and (self._revalidation is None or self._revalidation.done()):
+            self._revalidation = asyncio.create_task(self._arefresh())
+        return key
+
+    async def awarm(self) -> int:
+        """
+        Fetch the keys unless fresh ones are cached, e.g. at startup so the first requests do not wait on Keycloak.
+        Keys loaded from a snapshot are revalidated in the background instead.
+
+        Returns:
+            int: the number of keys held
+        """
+        if len(self._store):
+            if self.is_stale() and (self._revalidation is None or self._revalidation.done()):
+                self._revalidation = asyncio.create_task(self._arefresh())
+        else:
+            await self._arefresh()
+        return len(self._store)
+
+    def is_stale(self) -> bool:
+        return self._fetched_at is None or self._clock() - self._fetched_at >= self._ttl
+
+    def _refresh(self, wait: bool, kid: str | None = None) -> None:
+        if not self._lock.acquire(blocking=wait):
+            return
+        try:
+            if not self._start_attempt(kid):
+                return
+            try:
+                jwks = self._fetch()
+            except Exception:
+                log.exception("Failed to fetch JWKS")
+                return
+            self._load(jwks)
+            if self._snapshot is not None:
+                self._snapshot.save(jwks)
+        finally:
+            self._lock.release()
+
+    async def _arefresh(self, kid: str | None = None) -> None:
+        async with self._async_lock:
+            if not self._start_attempt(kid):
+                return
+            try:
+                jwks = await self._afetch()
+            except Exception:
+                log.exception("Failed to fetch JWKS")
+                return
+            self._load(jwks)
+            if self._snapshot is not None:
+                # file I/O, kept off the event loop
+                await asyncio.to_thread(self._snapshot.save, jwks)
+
+    def _start_attempt(self, kid: str | None) -> bool:
+        """
+        Decide whether a fetch is needed, and if so record the attempt for throttling.
+        """
+        # another caller may have fetched the keys while this one was waiting
+        if kid is None:
+            if not self.is_stale():
+                return False
+        elif kid in self._store:
+            return False
+        now = self._clock()
+        if self._last_attempt is not None and now - self._last_attempt < self._min_refresh_interval:
+            log.debug("Skipping JWKS refresh, last attempt was less than %ss ago", self._min_refresh_interval)
+            return False
+        self._last_attempt = now
+        return True
+
+    def _load(self, jwks: Dict[str, Any]) -> None:
+        self._store.load(jwks)
+        self._fetched_at = self._last_attempt
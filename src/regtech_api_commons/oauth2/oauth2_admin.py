@@ -1,46 +1,188 @@
+import hashlib
+import inspect
 import logging
-from typing import Dict, Any, Set
+import time
+from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Set, Tuple
 
-import json
+import httpx
 import jwt
 import requests
 
 from keycloak import KeycloakAdmin, KeycloakOpenIDConnection, exceptions as kce
+from starlette.concurrency import run_in_threadpool
 
+from regtech_api_commons.models.admin import LeiAssociationResult
 from regtech_api_commons.models.auth import RegTechUser
 from regtech_api_commons.api.exceptions import RegTechHttpException
 
 from regtech_api_commons.oauth2.config import KeycloakSettings
+from regtech_api_commons.oauth2.jwks import JwksCache, JwksSnapshot
+from regtech_api_commons.observability.metrics import (
+    JWKS_FETCH_SECONDS,
+    KEYCLOAK_ADMIN_SECONDS,
+    TOKEN_VERIFICATION_SECONDS,
+)
+from regtech_api_commons.observability.tracing import span
+from regtech_api_commons.utils.cache import TTLCache
 from regtech_regex.regex_config import RegexConfigs
 
 log = logging.getLogger(__name__)
 
 
-class OAuth2Admin:
-    def __init__(self, kc_settings: KeycloakSettings) -> None:
+class _InstrumentedKeycloakAdmin:
+    """
+    Passes calls through to the KeycloakAdmin, observing their durations in `KEYCLOAK_ADMIN_SECONDS`,
+    and tracing them as `regtech.keycloak_admin.<operation>` spans.
+    """
+
+    def __init__(self, admin: KeycloakAdmin) -> None:
+        self._admin = admin
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._admin, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        operation = name.removeprefix("a_")
+        if inspect.iscoroutinefunction(attr):
+
+            async def instrumented_coroutine(*args, **kwargs):
+                with span(f"regtech.keycloak_admin.{operation}"), KEYCLOAK_ADMIN_SECONDS.time(operation=operation):
+                    return await attr(*args, **kwargs)
+
+            return instrumented_coroutine
+
+        def instrumented(*args, **kwargs):
+            with span(f"regtech.keycloak_admin.{operation}"), KEYCLOAK_ADMIN_SECONDS.time(operation=operation):
+                return attr(*args, **kwargs)
+
+        return instrumented
+
+
+class BaseOAuth2Admin:
+    """
+    Token verification, signing key and cache management shared by `OAuth2Admin` and `AsyncOAuth2Admin`,
+    which add the blocking and the coroutine Keycloak admin methods respectively.
+    """
+
+    def __init__(self, kc_settings: KeycloakSettings, http_client: httpx.AsyncClient | None = None) -> None:
+        """
+        Args:
+            kc_settings(KeycloakSettings): Keycloak connection, token verification and cache settings
+            http_client(httpx.AsyncClient): client to fetch the signing keys with, e.g. one serving an in-process
+                JWKS in tests and benchmarks; by default one is created on first use, and closed by `aclose`
+        """
         self._kc_settings = kc_settings
-        self._keys = None
+        self._jwks = JwksCache(
+            self._fetch_keys,
+            ttl=self._kc_settings.jwks_ttl,
+            min_refresh_interval=self._kc_settings.jwks_min_refresh_interval,
+            afetch=self._afetch_keys,
+            snapshot=(
+                JwksSnapshot(self._kc_settings.jwks_snapshot_path, max_age=self._kc_settings.jwks_snapshot_max_age)
+                if self._kc_settings.jwks_snapshot_path
+                else None
+            ),
+        )
+        self._http_client = http_client
+        self._owns_http_client = http_client is None
+        self._claims_cache: TTLCache[bytes, Dict[str, Any]] | None = None
+        if self._kc_settings.claims_cache_size > 0:
+            self._claims_cache = TTLCache(self._kc_settings.claims_cache_size, ttl=self._kc_settings.claims_cache_ttl)
+        self._group_cache: TTLCache[str, str] | None = None
+        if self._kc_settings.group_cache_size > 0:
+            self._group_cache = TTLCache(self._kc_settings.group_cache_size, ttl=self._kc_settings.group_cache_ttl)
+        self._user_cache: TTLCache[str, RegTechUser] | None = None
+        if self._kc_settings.user_cache_size > 0:
+            self._user_cache = TTLCache(self._kc_settings.user_cache_size, ttl=self._kc_settings.user_cache_ttl)
+        self._executor: ThreadPoolExecutor | None = None
         conn = KeycloakOpenIDConnection(
             server_url=self._kc_settings.kc_url.unicode_string(),
             realm_name=self._kc_settings.kc_realm,
             client_id=self._kc_settings.kc_admin_client_id,
             client_secret_key=self._kc_settings.kc_admin_client_secret.get_secret_value(),
         )
-        self._admin = KeycloakAdmin(connection=conn)
+        self._admin = _InstrumentedKeycloakAdmin(KeycloakAdmin(connection=conn))
+
+    @property
+    def kc_settings(self) -> KeycloakSettings:
+        return self._kc_settings
+
+    @property
+    def claims_cache(self) -> TTLCache[bytes, Dict[str, Any]] | None:
+        return self._claims_cache
 
     def get_claims(self, token: str) -> Dict[str, str] | None:
+        if self._claims_cache is None:
+            return self._verify_claims(token)
+        token_hash = hashlib.sha256(token.encode()).digest()
+        claims = self._claims_cache.get(token_hash)
+        if claims is None:
+            claims = self._verify_claims(token)
+            if claims is not None:
+                self._cache_claims(token_hash, claims)
+        return claims
+
+    async def aget_claims(self, token: str) -> Dict[str, str] | None:
+        """
+        Non-blocking version of `get_claims` for use on the event loop.
+
+        Signing keys are fetched with an async HTTP client, and when `claims_verify_in_threadpool`
+        is enabled, the signature verification is offloaded to the threadpool.
+        """
+        if self._claims_cache is None:
+            return await self._averify_claims(token)
+        token_hash = hashlib.sha256(token.encode()).digest()
+        claims = self._claims_cache.get(token_hash)
+        if claims is None:
+            claims = await self._averify_claims(token)
+            if claims is not None:
+                self._cache_claims(token_hash, claims)
+        return claims
+
+    def _cache_claims(self, token_hash: bytes, claims: Dict[str, Any]) -> None:
+        """
+        Cache verified claims, making sure the entry expires before the token does.
+        """
+        ttl = self._kc_settings.claims_cache_ttl
+        if "exp" in claims:
+            leeway = self._kc_settings._jwt_opts.get("leeway", 0)
+            ttl = min(ttl, claims["exp"] - leeway - time.time())
+        if ttl > 0:
+            self._claims_cache.set(token_hash, claims, ttl=ttl)
+
+    def _verify_claims(self, token: str) -> Dict[str, str] | None:
+        # Get the key id from the token header, and use that to find
+        # the correct public key from Keycloak.  Then use the public key
+        # to decode the token and get the claims
+        with TOKEN_VERIFICATION_SECONDS.time():
+            with span("regtech.token.parse"):
+                kid = jwt.get_unverified_header(token).get("kid")
+            with span("regtech.token.key_lookup", {"kid": kid}):
+                key = self._jwks.get_key(kid)
+            with span("regtech.token.verify_signature"):
+                return self._decode(token, kid, key)
+
+    async def _averify_claims(self, token: str) -> Dict[str, str] | None:
+        with TOKEN_VERIFICATION_SECONDS.time():
+            with span("regtech.token.parse"):
+                kid = jwt.get_unverified_header(token).get("kid")
+            with span("regtech.token.key_lookup", {"kid": kid}):
+                key = await self._jwks.aget_key(kid)
+            with span("regtech.token.verify_signature"):
+                if key and self._kc_settings.claims_verify_in_threadpool:
+                    return await run_in_threadpool(self._decode, token, kid, key)
+                return self._decode(token, kid, key)
+
+    def _decode(self, token: str, kid: str | None, key: jwt.PyJWK | None) -> Dict[str, str] | None:
+        if not key:
+            log.warning("No signing key found for kid: %s", kid)
+            return None
         try:
-            # Get the key id from the token header, and use that to find
-            # the correct public key from Keycloak.  Then use the public key
-            # to decode the token and get the claims
-            kid = jwt.get_unverified_header(token).get("kid")
-            keys = self._get_keys()
-            key = next((key for key in keys["keys"] if key["kid"] == kid), None)
-            if not key:
-                pass
             return jwt.decode(
                 jwt=token,
-                key=jwt.PyJWK.from_json(json.dumps(key)),
+                key=key,
                 issuer=self._kc_settings.kc_realm_url.unicode_string(),
                 audience=self._kc_settings.auth_client,
                 options=self._kc_settings._jwt_opts,
@@ -48,41 +190,169 @@ class OAuth2Admin:
         except jwt.exceptions.ExpiredSignatureError:
             pass
 
-    def _get_keys(self) -> Dict[str, Any]:
-        if self._keys is None:
-            response = requests.get(self._kc_settings.certs_url)
-            self._keys = response.json()
-        return self._keys
+    def _fetch_keys(self) -> Dict[str, Any]:
+        with span("regtech.jwks.fetch"), JWKS_FETCH_SECONDS.time():
+            response = requests.get(self._kc_settings.certs_url, timeout=self._kc_settings.jwks_fetch_timeout)
+            response.raise_for_status()
+            return response.json()
+
+    async def _afetch_keys(self) -> Dict[str, Any]:
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(timeout=self._kc_settings.jwks_fetch_timeout)
+        with span("regtech.jwks.fetch"), JWKS_FETCH_SECONDS.time():
+            response = await self._http_client.get(self._kc_settings.certs_url.unicode_string())
+            response.raise_for_status()
+            return response.json()
+
+    async def awarm_keys(self) -> int:
+        """
+        Fetch the realm's signing keys ahead of the first request, failures are logged and retried on demand.
+
+        Returns:
+            int: the number of signing keys held
+        """
+        return await self._jwks.awarm()
+
+    async def aping_jwks(self) -> int:
+        """
+        Fetch the realm's signing keys, bypassing the key cache, to check Keycloak is reachable.
+
+        Returns:
+            int: the number of keys published
+        """
+        return len((await self._afetch_keys()).get("keys", []))
+
+    async def aping_admin_token(self) -> None:
+        """
+        Obtain a new admin token, to check the admin client's credentials are accepted by Keycloak.
+        """
+        await self._admin.connection.a_get_token()
+
+    async def aclose(self) -> None:
+        """
+        Close the async HTTP client used to fetch signing keys, and the admin worker threads.
+        """
+        if self._http_client is not None and self._owns_http_client:
+            await self._http_client.aclose()
+            self._http_client = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _get_cached_user(self, user_id: str) -> RegTechUser | None:
+        # deep copies, so callers changing a user's institutions list can not change the cached user
+        if self._user_cache is not None:
+            user = self._user_cache.get(user_id)
+            if user is not None:
+                return user.model_copy(deep=True)
+        return None
+
+    def _cache_user(self, user_id: str, user: RegTechUser) -> None:
+        if self._user_cache is not None:
+            self._user_cache.set(user_id, user.model_copy(deep=True))
+
+    def invalidate_user(self, user_id: str) -> None:
+        """
+        Drop the user from the user cache, done automatically by this instance's user and group membership updates.
+        """
+        if self._user_cache is not None:
+            self._user_cache.invalidate(user_id)
 
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._kc_settings.kc_admin_max_concurrency, thread_name_prefix="oauth2-admin"
+            )
+        return self._executor
+
+    def _cache_group_id(self, lei: str, group_id: str | None) -> None:
+        if self._group_cache is not None and group_id:
+            self._group_cache.set(lei, group_id)
+
+    def _invalidate_missing_group(self, lei: str, status_code: int | None) -> bool:
+        """
+        Evict the LEI's cached group id after a 404, as it may belong to a group since deleted by another process.
+
+        Returns:
+            bool: whether the group id was evicted
+        """
+        if self._group_cache is not None and status_code == HTTPStatus.NOT_FOUND:
+            self._group_cache.invalidate(lei)
+            return True
+        return False
+
+    def _validate_leis(self, leis: Set[str]) -> Tuple[List[str], Dict[str, LeiAssociationResult]]:
+        regex_configs = RegexConfigs.instance()
+        valid_leis = []
+        invalid_results = {}
+        for lei in leis:
+            if regex_configs.lei.regex.match(lei):
+                valid_leis.append(lei)
+            else:
+                invalid_results[lei] = LeiAssociationResult(
+                    lei=lei, error=f"Invalid LEI {lei}. {regex_configs.lei.error_text}"
+                )
+        return valid_leis, invalid_results
+
+    def _cached_group_ids(self, leis: List[str]) -> Dict[str, str]:
+        if self._group_cache is None:
+            return {}
+        return {lei: group_id for lei in leis if (group_id := self._group_cache.get(lei)) is not None}
+
+    def _group_id_from_path_lookup(self, lei: str, group: Dict[str, Any] | None) -> str | None:
+        # get_group_by_path returns the error body instead of raising when the group does not exist
+        group_id = group.get("id") if group else None
+        self._cache_group_id(lei, group_id)
+        return group_id
+
+
+class OAuth2Admin(BaseOAuth2Admin):
     def get_user(self, user_id: str) -> RegTechUser:
-        user = self._admin.get_user(user_id)
-        groups = self._admin.get_user_groups(user_id)
-        return RegTechUser.from_kc(user, groups)
+        cached_user = self._get_cached_user(user_id)
+        if cached_user is not None:
+            return cached_user
+        groups = self._get_executor().submit(self._admin.get_user_groups, user_id)
+        user = RegTechUser.from_kc(self._admin.get_user(user_id), groups.result())
+        self._cache_user(user_id, user)
+        return user
 
     def update_user(self, user_id: str, payload: Dict[str, Any]) -> None:
         try:
             self._admin.update_user(user_id, payload)
+            self.invalidate_user(user_id)
         except kce.KeycloakError as e:
             log.exception("Failed to update user: %s", user_id)
             raise RegTechHttpException(status_code=e.response_code, detail="Failed to update user")
 
     def upsert_group(self, lei: str, name: str) -> str:
         try:
-            group_payload = {"name": lei}
-            group = self.get_group(lei)
-            if group is None:
-                return self._admin.create_group(group_payload)
-            else:
-                self._admin.update_group(group["id"], group_payload)
-                return group["id"]
+            try:
+                return self._upsert_group(lei)
+            except kce.KeycloakError as e:
+                if not self._invalidate_missing_group(lei, e.response_code):
+                    raise
+                # retried with a fresh lookup, creating the group if it is gone
+                return self._upsert_group(lei)
         except kce.KeycloakError as e:
+            self._invalidate_missing_group(lei, e.response_code)
             log.exception("Failed to upsert group, lei: %s, name: %s", lei, name)
             raise RegTechHttpException(status_code=e.response_code, detail="Failed to upsert group")
 
+    def _upsert_group(self, lei: str) -> str:
+        group_payload = {"name": lei}
+        group_id = self.get_group_id(lei)
+        if group_id is None:
+            group_id = self._admin.create_group(group_payload)
+            self._cache_group_id(lei, group_id)
+        else:
+            self._admin.update_group(group_id, group_payload)
+        return group_id
+
     def get_group(self, lei: str) -> Dict[str, Any] | None:
         try:
             group = self._admin.get_group_by_path(f"/{lei}")
             if group and "id" in group:
+                self._cache_group_id(lei, group["id"])
                 return group
             else:
                 log.error(f"Unexpected results from get_group_by_path: {group}")
@@ -90,9 +360,39 @@ class OAuth2Admin:
         except kce.KeycloakError:
             return None
 
+    def get_group_id(self, lei: str) -> str | None:
+        """
+        Get the id of the LEI's group, from the group id cache when enabled with `group_cache_size`.
+        """
+        if self._group_cache is not None:
+            group_id = self._group_cache.get(lei)
+            if group_id is not None:
+                return group_id
+        group = self.get_group(lei)
+        return group["id"] if group else None
+
+    def preload_group_cache(self) -> int:
+        """
+        Fill the group id cache from a single paged listing of the top level groups.
+
+        Returns:
+            int: number of cached group ids
+        """
+        if self._group_cache is None:
+            return 0
+        try:
+            groups = self._admin.get_groups({"briefRepresentation": True})
+        except kce.KeycloakError:
+            log.exception("Failed to preload group cache")
+            return 0
+        for group in groups:
+            self._cache_group_id(group["name"], group["id"])
+        return len(self._group_cache)
+
     def associate_to_group(self, user_id: str, group_id: str) -> None:
         try:
             self._admin.group_user_add(user_id, group_id)
+            self.invalidate_user(user_id)
         except kce.KeycloakError as e:
             log.exception("Failed to associate user %s to group %s", user_id, group_id)
             raise RegTechHttpException(status_code=e.response_code, detail="Failed to associate user to group")
@@ -100,10 +400,16 @@ class OAuth2Admin:
     def associate_to_lei(self, user_id: str, lei: str) -> None:
         regex_configs = RegexConfigs.instance()
         if regex_configs.lei.regex.match(lei):
-            group = self.get_group(lei)
-            group_id = group["id"] if group else self._admin.create_group({"name": lei})
+            group_id = self.get_group_id(lei)
+            if group_id is None:
+                group_id = self._admin.create_group({"name": lei})
+                self._cache_group_id(lei, group_id)
             if group_id:
-                self.associate_to_group(user_id, group_id)
+                try:
+                    self.associate_to_group(user_id, group_id)
+                except RegTechHttpException as e:
+                    self._invalidate_missing_group(lei, e.status_code)
+                    raise
         else:
             raise ValueError(f"Invalid LEI {lei}. {regex_configs.lei.error_text}")
 
@@ -111,10 +417,68 @@ class OAuth2Admin:
         for lei in leis:
             self.associate_to_lei(user_id, lei)
 
+    def bulk_associate_to_leis(self, user_id: str, leis: Set[str]) -> Dict[str, LeiAssociationResult]:
+        """
+        Associate the user to the groups of many LEIs, creating missing groups.
+
+        All LEIs are validated up front, then each LEI's group is resolved from the group id cache or looked up
+        by path, missing groups are created and the user added to each group concurrently, with at most
+        `kc_admin_max_concurrency` calls in flight across this instance.  Failures are reported per LEI
+        instead of aborting the remaining associations.
+
+        Args:
+            user_id(str): Keycloak user id
+            leis(Set[str]): LEIs to associate the user to
+
+        Returns:
+            Dict[str, LeiAssociationResult]: association result for each LEI
+        """
+        valid_leis, results = self._validate_leis(leis)
+        if not valid_leis:
+            return results
+
+        group_ids = self._cached_group_ids(valid_leis)
+        executor = self._get_executor()
+        futures = [
+            executor.submit(self._associate_to_lei_group, user_id, lei, group_ids.get(lei)) for lei in valid_leis
+        ]
+        for future in futures:
+            result = future.result()
+            results[result.lei] = result
+        self.invalidate_user(user_id)
+        return results
+
+    def _associate_to_lei_group(self, user_id: str, lei: str, group_id: str | None) -> LeiAssociationResult:
+        result = LeiAssociationResult(lei=lei, group_id=group_id)
+        try:
+            if result.group_id is None:
+                result.group_id = self._group_id_from_path_lookup(lei, self._admin.get_group_by_path(f"/{lei}"))
+            if result.group_id is None:
+                result.group_id = self._admin.create_group({"name": lei}, skip_exists=True)
+                result.group_created = result.group_id is not None
+                self._cache_group_id(lei, result.group_id)
+                if result.group_id is None:
+                    # created concurrently by someone else
+                    group = self.get_group(lei)
+                    result.group_id = group["id"] if group else None
+            if result.group_id is None:
+                result.error = f"Failed to resolve group for LEI {lei}"
+            else:
+                self._admin.group_user_add(user_id, result.group_id)
+        except kce.KeycloakError as e:
+            self._invalidate_missing_group(lei, e.response_code)
+            log.exception("Failed to associate user %s to lei %s", user_id, lei)
+            result.error = str(e)
+        return result
+
     def delete_group(self, lei: str) -> Dict[str, Any] | None:
         try:
-            group = self.get_group(lei)
-            return self._admin.delete_group(group["id"])
+            group_id = self.get_group_id(lei)
+            if self._group_cache is not None:
+                self._group_cache.invalidate(lei)
+            if group_id is None:
+                raise RegTechHttpException(status_code=HTTPStatus.NOT_FOUND, detail="Group not found")
+            return self._admin.delete_group(group_id)
         except kce.KeycloakError as e:
             log.exception("Failed to delete group, lei: %s", lei)
             raise RegTechHttpException(status_code=e.response_code, detail="Failed to delete group")
@@ -1,5 +1,5 @@
 import logging
-from typing import Coroutine, Any, Dict, List, Tuple
+from typing import Coroutine, Any, Dict, FrozenSet, Iterable, List, Sequence, Tuple
 from starlette.authentication import (
     AuthCredentials,
     AuthenticationBackend,
@@ -11,40 +11,152 @@ from starlette.requests import HTTPConnection
 
 from regtech_api_commons.models.auth import AuthenticatedUser
 
-from regtech_api_commons.oauth2.oauth2_admin import OAuth2Admin
+from regtech_api_commons.oauth2.oauth2_admin import BaseOAuth2Admin
+from regtech_api_commons.observability.tracing import span
 
 log = logging.getLogger(__name__)
 
+REALM_MANAGEMENT_ROLES = ("resource_access", "realm-management", "roles")
+ACCOUNT_ROLES = ("resource_access", "account", "roles")
+REALM_ROLES = ("realm_access", "roles")
+DEFAULT_SCOPE_CLAIMS = (REALM_MANAGEMENT_ROLES, ACCOUNT_ROLES)
+
+
+class ClaimsAuthCredentials(AuthCredentials):
+    """
+    AuthCredentials whose scopes are extracted from the token claims on first access,
+    so requests that never check scopes do not pay for building them.
+    """
+
+    def __init__(
+        self, claims: Dict[str, Any], scope_claims: Tuple[Tuple[str, ...], ...], extra_scopes: Tuple[str, ...] = ()
+    ) -> None:
+        self._claims = claims
+        self._scope_claims = scope_claims
+        self._extra_scopes = extra_scopes
+        self._scopes: List[str] | None = None
+        self._scope_set: FrozenSet[str] | None = None
+
+    @property
+    def scopes(self) -> List[str]:
+        if self._scopes is None:
+            scopes = []
+            for path in self._scope_claims:
+                scopes.extend(extract_nested(self._claims, *path))
+            scopes.extend(self._extra_scopes)
+            self._scopes = scopes
+        return self._scopes
+
+    @scopes.setter
+    def scopes(self, scopes: List[str]) -> None:
+        self._scopes = list(scopes)
+        self._scope_set = None
+
+    @property
+    def scope_set(self) -> FrozenSet[str]:
+        if self._scope_set is None:
+            self._scope_set = frozenset(self.scopes)
+        return self._scope_set
+
+
+def extract_nested(data: Dict[str, Any], *keys: str) -> List[str]:
+    _ele = data
+    try:
+        for key in keys:
+            _ele = _ele[key]
+        return _ele
+    except (KeyError, TypeError):
+        return []
+
+
+class _ReadOnlyScopes(Sequence[str]):
+    """
+    Immutable scopes sequence, comparing equal to a list or tuple of the same scopes.
+    """
+
+    __slots__ = ("_scopes",)
+
+    def __init__(self, scopes: Iterable[str]) -> None:
+        self._scopes = tuple(scopes)
+
+    def __getitem__(self, index):
+        return self._scopes[index]
+
+    def __len__(self) -> int:
+        return len(self._scopes)
+
+    def __contains__(self, scope: object) -> bool:
+        return scope in self._scopes
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (list, tuple, _ReadOnlyScopes)):
+            return self._scopes == tuple(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(list(self._scopes))
+
+
+class FrozenAuthCredentials(AuthCredentials):
+    """
+    AuthCredentials whose scopes can be neither modified nor reassigned, so a single instance can be shared.
+    """
+
+    def __init__(self, scopes: Iterable[str] | None = None) -> None:
+        self._scopes = _ReadOnlyScopes(scopes or ())
+
+    @property
+    def scopes(self) -> Sequence[str]:
+        return self._scopes
+
+
+# shared by every unauthenticated request
+UNAUTHENTICATED_CREDENTIALS = FrozenAuthCredentials("unauthenticated")
+UNAUTHENTICATED_USER = UnauthenticatedUser()
+UNAUTHENTICATED = (UNAUTHENTICATED_CREDENTIALS, UNAUTHENTICATED_USER)
+
 
 class BearerTokenAuthBackend(AuthenticationBackend):
-    def __init__(self, token_bearer: OAuth2AuthorizationCodeBearer, oauth2_admin: OAuth2Admin) -> None:
+    """
+    Authenticates requests with the bearer token, mapping the roles found at `scope_claims` to the request's scopes.
+
+    Args:
+        token_bearer(OAuth2AuthorizationCodeBearer): extracts the token from the request
+        oauth2_admin(BaseOAuth2Admin): verifies the token and decodes its claims
+        scope_claims(Sequence[Sequence[str]]): key paths of the claims holding role lists,
+            e.g. `REALM_ROLES` to include the realm roles; defaults to the realm-management and account client roles
+    """
+
+    def __init__(
+        self,
+        token_bearer: OAuth2AuthorizationCodeBearer,
+        oauth2_admin: BaseOAuth2Admin,
+        scope_claims: Sequence[Sequence[str]] = DEFAULT_SCOPE_CLAIMS,
+    ) -> None:
         self.token_bearer = token_bearer
         self.oauth2_admin = oauth2_admin
+        self.scope_claims = tuple(tuple(path) for path in scope_claims)
 
     async def authenticate(self, conn: HTTPConnection) -> Coroutine[Any, Any, Tuple[AuthCredentials, BaseUser] | None]:
-        try:
-            if not conn.headers.get("Authorization"):
-                return AuthCredentials("unauthenticated"), UnauthenticatedUser()
-            token = await self.token_bearer(conn)
-            if not token:
-                return AuthCredentials("unauthenticated"), UnauthenticatedUser()
-            claims = self.oauth2_admin.get_claims(token)
-            if claims is not None:
-                auths = (
-                    self.extract_nested(claims, "resource_access", "realm-management", "roles")
-                    + self.extract_nested(claims, "resource_access", "account", "roles")
-                    + ["authenticated"]
-                )
-                return AuthCredentials(auths), AuthenticatedUser.from_claim(claims)
-        except Exception:
-            log.exception("failed to get claims")
-        return AuthCredentials("unauthenticated"), UnauthenticatedUser()
+        with span("regtech.authenticate"):
+            try:
+                if not conn.headers.get("Authorization"):
+                    return UNAUTHENTICATED
+                token = await self.token_bearer(conn)
+                if not token:
+                    return UNAUTHENTICATED
+                claims = await self.oauth2_admin.aget_claims(token)
+                if claims is not None:
+                    with span("regtech.claims.map"):
+                        return (
+                            ClaimsAuthCredentials(claims, self.scope_claims, ("authenticated",)),
+                            AuthenticatedUser.from_claim(claims, validate=False),
+                        )
+            except Exception:
+                log.exception("failed to get claims")
+            return UNAUTHENTICATED
 
     def extract_nested(self, data: Dict[str, Any], *keys: str) -> List[str]:
-        _ele = data
-        try:
-            for key in keys:
-                _ele = _ele[key]
-            return _ele
-        except KeyError:
-            return []
+        return extract_nested(data, *keys)
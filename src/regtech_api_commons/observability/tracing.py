@@ -0,0 +1,51 @@
+from typing import Any, ContextManager, Dict, Protocol
+
+
+class Tracer(Protocol):
+    """
+    The part of OpenTelemetry's Tracer used by the library, so an OpenTelemetry tracer can be used as is,
+    e.g. `set_tracer(opentelemetry.trace.get_tracer("regtech_api_commons"))`.
+    """
+
+    def start_as_current_span(self, name: str, attributes: Dict[str, Any] | None = None) -> ContextManager[Any]: ...
+
+
+class _NoOpSpan:
+    def __enter__(self) -> "_NoOpSpan":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoOpSpan()
+_tracer: Tracer | None = None
+
+
+def set_tracer(tracer: Tracer | None) -> None:
+    """
+    Trace the library's authentication, authorization and Keycloak admin steps with the given tracer,
+    or stop tracing them with None, the default.
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Tracer | None:
+    return _tracer
+
+
+def span(name: str, attributes: Dict[str, Any] | None = None) -> ContextManager[Any]:
+    """
+    Context manager tracing its block as a span of the current trace, a shared no-op when no tracer is set.
+
+    Args:
+        name(str): span name, the library's spans are prefixed with `regtech.`
+        attributes(Dict[str, Any]): span attributes, those set to None, e.g. a token without a `kid`, are left out
+            as OpenTelemetry does not accept None attribute values
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    if attributes and None in attributes.values():
+        attributes = {key: value for key, value in attributes.items() if value is not None}
+    return _tracer.start_as_current_span(name, attributes=attributes)
@@ -0,0 +1,383 @@
+import asyncio
+import base64
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Set
+
+import jwt
+import uvicorn
+from cryptography.hazmat.primitives.asymmetric import rsa
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from starlette.types import Receive, Scope, Send
+
+from regtech_api_commons.oauth2.config import KeycloakSettings
+
+
+class FaultInjection:
+    """
+    Simulated upstream conditions: every request is delayed by `latency` seconds, plus up to `jitter` seconds,
+    and fails with `error_status` for an `error_rate` fraction of requests.  Can be changed while serving.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+        error_status: int = 503,
+        seed: int | None = None,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+
+    async def apply(self) -> Response | None:
+        """
+        Wait out the simulated latency.
+
+        Returns:
+            Response | None: the injected error response, or None if the request should be handled
+        """
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return JSONResponse({"error": "injected failure"}, status_code=self.error_status)
+        return None
+
+
+class FakeUpstream(ABC):
+    """
+    Base of the in-process upstream fakes, an ASGI app applying fault injection and counting requests.
+
+    The app can be called in-process, e.g. through `httpx.ASGITransport`, or served on a local port
+    with `serve`, for clients like python-keycloak that manage their own connections.
+    """
+
+    def __init__(self, base_url: str, faults: FaultInjection | None = None) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.faults = faults or FaultInjection()
+        self.request_counts: Counter[str] = Counter()
+        self._app = Starlette(routes=self.routes())
+
+    @abstractmethod
+    def routes(self) -> List[Route]:
+        """
+        Routes of the fake's Starlette app.
+        """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            self.request_counts[f"{scope['method']} {scope['path']}"] += 1
+            error = await self.faults.apply()
+            if error is not None:
+                await error(scope, receive, send)
+                return
+        await self._app(scope, receive, send)
+
+    @contextmanager
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> Iterator[str]:
+        """
+        Serve the fake with uvicorn in a background thread, updating `base_url` to the served address.
+
+        Args:
+            host(str): interface to listen on
+            port(int): port to listen on, 0 picks a free one
+
+        Yields:
+            str: the base url the fake is served at
+        """
+        server = uvicorn.Server(uvicorn.Config(self, host=host, port=port, log_level="warning", lifespan="off"))
+        thread = threading.Thread(target=server.run, name=f"{type(self).__name__}-server", daemon=True)
+        thread.start()
+        try:
+            while not server.started:
+                if not thread.is_alive():
+                    raise RuntimeError(f"{type(self).__name__} failed to start")
+                time.sleep(0.01)
+            served_port = server.servers[0].sockets[0].getsockname()[1]
+            self.base_url = f"http://{host}:{served_port}"
+            yield self.base_url
+        finally:
+            server.should_exit = True
+            thread.join()
+
+
+class FakeKeycloak(FakeUpstream):
+    """
+    Stand-in for a Keycloak realm, serving the endpoints used by `OAuth2Admin`: the realm's signing keys,
+    client credentials admin tokens, and the user, group and group membership admin endpoints.
+
+    Tokens for the realm's users are minted with `mint_token`.  Users are added with `add_user`,
+    groups are created through the admin endpoints like with Keycloak, or with `add_group`.
+    """
+
+    def __init__(
+        self,
+        realm: str = "regtech",
+        client_id: str = "regtech-client",
+        base_url: str = "http://keycloak",
+        faults: FaultInjection | None = None,
+    ) -> None:
+        self.realm = realm
+        self.client_id = client_id
+        self.kid = "fake-keycloak-key"
+        self._private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.groups: Dict[str, Dict[str, Any]] = {}
+        self.memberships: Dict[str, Set[str]] = {}
+        super().__init__(base_url, faults)
+
+    @property
+    def realm_url(self) -> str:
+        return f"{self.base_url}/realms/{self.realm}"
+
+    def settings(self, **overrides: Any) -> KeycloakSettings:
+        """
+        KeycloakSettings pointing at this fake, ignoring env vars and dotenv files.
+        """
+        return KeycloakSettings(
+            _env_file=None,
+            **{
+                "auth_client": self.client_id,
+                "auth_url": f"{self.realm_url}/protocol/openid-connect/auth",
+                "token_url": f"{self.realm_url}/protocol/openid-connect/token",
+                "certs_url": f"{self.realm_url}/protocol/openid-connect/certs",
+                "kc_url": self.base_url,
+                "kc_realm": self.realm,
+                "kc_admin_client_id": "admin-cli",
+                "kc_admin_client_secret": "fake-secret",
+                "kc_realm_url": self.realm_url,
+                **overrides,
+            },
+        )
+
+    def jwks(self) -> Dict[str, Any]:
+        public_numbers = self._private_key.public_key().public_numbers()
+
+        def encode(number: int) -> str:
+            return base64.urlsafe_b64encode(number.to_bytes((number.bit_length() + 7) // 8, "big")).decode().rstrip("=")
+
+        return {
+            "keys": [
+                {
+                    "kid": self.kid,
+                    "kty": "RSA",
+                    "alg": "RS256",
+                    "use": "sig",
+                    "n": encode(public_numbers.n),
+                    "e": encode(public_numbers.e),
+                }
+            ]
+        }
+
+    def mint_token(
+        self,
+        user_id: str,
+        institutions: Iterable[str] = (),
+        roles: Iterable[str] = (),
+        expires_in: int = 300,
+        **claims: Any,
+    ) -> str:
+        """
+        Mint an access token for the user, signed with the realm's key.
+
+        Args:
+            user_id(str): the token's subject, filled in from the user added with `add_user` if there is one
+            institutions(Iterable[str]): LEIs put in the `institutions` claim as group paths
+            roles(Iterable[str]): account client roles
+            expires_in(int): seconds until the token expires
+            claims: additional or overriding claims
+        """
+        user = self.users.get(user_id, {})
+        now = int(time.time())
+        payload = {
+            "iss": self.realm_url,
+            "aud": self.client_id,
+            "iat": now,
+            "exp": now + expires_in,
+            "sub": user_id,
+            "preferred_username": user.get("username", user_id),
+            "email": user.get("email", f"{user_id}@local.host"),
+            "name": " ".join(filter(None, [user.get("firstName"), user.get("lastName")])) or user_id,
+            "institutions": [f"/{lei}" for lei in institutions],
+            "resource_access": {"account": {"roles": list(roles)}},
+            **claims,
+        }
+        return jwt.encode(payload, self._private_key, algorithm="RS256", headers={"kid": self.kid})
+
+    def add_user(
+        self,
+        username: str,
+        email: str | None = None,
+        first_name: str = "",
+        last_name: str = "",
+        user_id: str | None = None,
+    ) -> str:
+        user_id = user_id or str(uuid.uuid4())
+        self.users[user_id] = {
+            "id": user_id,
+            "username": username,
+            "email": email or f"{username}@local.host",
+            "firstName": first_name,
+            "lastName": last_name,
+            "enabled": True,
+        }
+        self.memberships.setdefault(user_id, set())
+        return user_id
+
+    def add_group(self, name: str) -> str:
+        group_id = str(uuid.uuid4())
+        self.groups[group_id] = {"id": group_id, "name": name, "path": f"/{name}", "subGroups": []}
+        return group_id
+
+    def routes(self) -> List[Route]:
+        realm = "/realms/{realm}"
+        admin = "/admin/realms/{realm}"
+        return [
+            Route(f"{realm}/protocol/openid-connect/certs", self._certs, methods=["GET"]),
+            Route(f"{realm}/protocol/openid-connect/token", self._token, methods=["POST"]),
+            Route(f"{admin}/users/{{user_id}}", self._get_user, methods=["GET"]),
+            Route(f"{admin}/users/{{user_id}}", self._update_user, methods=["PUT"]),
+            Route(f"{admin}/users/{{user_id}}/groups", self._get_user_groups, methods=["GET"]),
+            Route(f"{admin}/users/{{user_id}}/groups/{{group_id}}", self._add_user_to_group, methods=["PUT"]),
+            Route(f"{admin}/groups", self._get_groups, methods=["GET"]),
+            Route(f"{admin}/groups", self._create_group, methods=["POST"]),
+            Route(f"{admin}/groups/{{group_id}}", self._update_group, methods=["PUT"]),
+            Route(f"{admin}/groups/{{group_id}}", self._delete_group, methods=["DELETE"]),
+            Route(f"{admin}/group-by-path/{{path:path}}", self._get_group_by_path, methods=["GET"]),
+        ]
+
+    @staticmethod
+    def _not_found(kind: str) -> JSONResponse:
+        return JSONResponse({"error": f"{kind} not found"}, status_code=404)
+
+    @staticmethod
+    def _page(request: Request, items: List[Any]) -> JSONResponse:
+        first = int(request.query_params.get("first", 0))
+        size = request.query_params.get("max")
+        return JSONResponse(items[first : first + int(size)] if size is not None else items[first:])
+
+    async def _certs(self, request: Request) -> Response:
+        return JSONResponse(self.jwks())
+
+    async def _token(self, request: Request) -> Response:
+        access_token = self.mint_token("service-account-admin-cli", roles=["manage-users", "query-groups"])
+        return JSONResponse(
+            {"access_token": access_token, "expires_in": 300, "refresh_expires_in": 0, "token_type": "Bearer"}
+        )
+
+    async def _get_user(self, request: Request) -> Response:
+        user = self.users.get(request.path_params["user_id"])
+        return JSONResponse(user) if user else self._not_found("User")
+
+    async def _update_user(self, request: Request) -> Response:
+        user = self.users.get(request.path_params["user_id"])
+        if not user:
+            return self._not_found("User")
+        user.update(await request.json())
+        return Response(status_code=204)
+
+    async def _get_user_groups(self, request: Request) -> Response:
+        user_id = request.path_params["user_id"]
+        if user_id not in self.users:
+            return self._not_found("User")
+        groups = [self.groups[group_id] for group_id in self.memberships[user_id] if group_id in self.groups]
+        return self._page(request, sorted(groups, key=lambda group: group["name"]))
+
+    async def _add_user_to_group(self, request: Request) -> Response:
+        user_id, group_id = request.path_params["user_id"], request.path_params["group_id"]
+        if user_id not in self.users:
+            return self._not_found("User")
+        if group_id not in self.groups:
+            return self._not_found("Group")
+        self.memberships[user_id].add(group_id)
+        return Response(status_code=204)
+
+    async def _get_groups(self, request: Request) -> Response:
+        groups = sorted(self.groups.values(), key=lambda group: group["name"])
+        search = request.query_params.get("search")
+        if search:
+            groups = [group for group in groups if search in group["name"]]
+        return self._page(request, groups)
+
+    async def _create_group(self, request: Request) -> Response:
+        name = (await request.json())["name"]
+        if any(group["name"] == name for group in self.groups.values()):
+            return JSONResponse({"errorMessage": f"Top level group named '{name}' already exists."}, status_code=409)
+        group_id = self.add_group(name)
+        return Response(status_code=201, headers={"Location": f"{request.url}/{group_id}"})
+
+    async def _update_group(self, request: Request) -> Response:
+        group = self.groups.get(request.path_params["group_id"])
+        if not group:
+            return self._not_found("Group")
+        name = (await request.json()).get("name", group["name"])
+        group.update(name=name, path=f"/{name}")
+        return Response(status_code=204)
+
+    async def _delete_group(self, request: Request) -> Response:
+        group_id = request.path_params["group_id"]
+        if self.groups.pop(group_id, None) is None:
+            return self._not_found("Group")
+        for group_ids in self.memberships.values():
+            group_ids.discard(group_id)
+        return Response(status_code=204)
+
+    async def _get_group_by_path(self, request: Request) -> Response:
+        path = "/" + request.path_params["path"].strip("/")
+        group = next((group for group in self.groups.values() if group["path"] == path), None)
+        return JSONResponse(group) if group else self._not_found("Group")
+
+
+class FakeInstitutionsApi(FakeUpstream):
+    """
+    Stand-in for the institutions API endpoints used by `verify_lei` and `verify_leis`.
+
+    `institutions_url` is the url to give `verify_lei`, `bulk_url` the bulk url to give `verify_leis`.
+    LEIs not set with `set_lei` are reported as `default_active`.
+    """
+
+    def __init__(
+        self, base_url: str = "http://institutions", faults: FaultInjection | None = None, default_active: bool = True
+    ) -> None:
+        self.default_active = default_active
+        self.leis: Dict[str, bool] = {}
+        super().__init__(base_url, faults)
+
+    @property
+    def institutions_url(self) -> str:
+        return f"{self.base_url}/v1/institutions/"
+
+    @property
+    def bulk_url(self) -> str:
+        return f"{self.base_url}/v1/institutions"
+
+    def set_lei(self, lei: str, is_active: bool) -> None:
+        self.leis[lei] = is_active
+
+    def _institution(self, lei: str) -> Dict[str, Any]:
+        return {"lei": lei, "is_active": self.leis.get(lei, self.default_active)}
+
+    def routes(self) -> List[Route]:
+        return [
+            Route("/v1/institutions", self._get_institutions, methods=["GET"]),
+            Route("/v1/institutions/{lei}", self._get_institution, methods=["GET"]),
+        ]
+
+    async def _get_institutions(self, request: Request) -> Response:
+        leis = [lei for lei in request.query_params.get("leis", "").split(",") if lei]
+        return JSONResponse([self._institution(lei) for lei in leis])
+
+    async def _get_institution(self, request: Request) -> Response:
+        return JSONResponse(self._institution(request.path_params["lei"]))
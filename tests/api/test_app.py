@@ -0,0 +1,102 @@
+import time
+from contextlib import asynccontextmanager
+from typing import Annotated
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+from starlette.authentication import requires
+
+from regtech_api_commons.api.app import create_app, get_oauth2_admin, install
+from regtech_api_commons.api.exceptions import RegTechHttpException
+from regtech_api_commons.api.readiness import ReadinessMonitor, jwks_probe
+from regtech_api_commons.api.router_wrapper import Router
+from regtech_api_commons.oauth2.config import KeycloakSettings
+from regtech_api_commons.oauth2.oauth2_admin import OAuth2Admin
+
+kc_settings = KeycloakSettings(
+    **{
+        "kc_url": "http://localhost",
+        "kc_realm": "",
+        "kc_admin_client_id": "",
+        "kc_admin_client_secret": "",
+        "kc_realm_url": "http://localhost",
+        "auth_url": "http://localhost",
+        "token_url": "http://localhost",
+        "certs_url": "http://localhost",
+        "auth_client": "",
+    }
+)
+
+
+def test_install_manages_lifecycle(mocker: MockerFixture):
+    mock_warm = mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.awarm_keys", return_value=1)
+    mock_close = mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.aclose")
+    mock_http_client = mocker.AsyncMock()
+    events = []
+
+    @asynccontextmanager
+    async def app_lifespan(app: FastAPI):
+        events.append("startup")
+        yield
+        events.append("shutdown")
+
+    app = FastAPI(lifespan=app_lifespan)
+    oauth2_admin = install(app, kc_settings=kc_settings, http_client=mock_http_client)
+
+    with TestClient(app):
+        mock_warm.assert_awaited_once()
+        assert events == ["startup"]
+        mock_close.assert_not_awaited()
+    assert events == ["startup", "shutdown"]
+    mock_close.assert_awaited_once()
+    mock_http_client.aclose.assert_awaited_once()
+    assert app.state.oauth2_admin is oauth2_admin
+
+
+def test_create_app_authenticates_and_handles_errors(mocker: MockerFixture):
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.awarm_keys", return_value=1)
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.aget_claims").return_value = {
+        "sub": "user-1",
+        "preferred_username": "user1",
+        "email": "user1@local.host",
+        "resource_access": {"account": {"roles": ["view-profile"]}},
+    }
+    app = create_app(kc_settings=kc_settings)
+
+    @app.get("/me")
+    @requires("authenticated")
+    async def me(request: Request, oauth2_admin: Annotated[OAuth2Admin, Depends(get_oauth2_admin)]):
+        assert oauth2_admin is app.state.oauth2_admin
+        return request.user.id
+
+    @app.get("/fail")
+    async def fail():
+        raise RegTechHttpException(404, name="Not Found", detail="nothing here")
+
+    with TestClient(app) as client:
+        assert client.get("/me").status_code == 403
+        response = client.get("/me", headers={"Authorization": "Bearer test"})
+        assert response.status_code == 200
+        assert response.json() == "user-1"
+        response = client.get("/fail")
+        assert response.status_code == 404
+        assert response.json() == {"error_name": "Not Found", "error_detail": "nothing here"}
+
+
+def test_install_runs_readiness_probes(mocker: MockerFixture):
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.awarm_keys", return_value=1)
+    mock_ping = mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.aping_jwks", return_value=2)
+    readiness = ReadinessMonitor(interval=60)
+    app = FastAPI()
+    oauth2_admin = install(app, kc_settings=kc_settings, readiness=readiness)
+    readiness.add_probe("jwks", jwks_probe(oauth2_admin))
+    app.include_router(Router(readiness=readiness))
+
+    with TestClient(app) as client:
+        for _ in range(100):
+            if readiness.ready:
+                break
+            time.sleep(0.01)
+        assert client.get("/readiness").status_code == 200
+    mock_ping.assert_awaited_once()
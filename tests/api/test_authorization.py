@@ -0,0 +1,52 @@
+from starlette.authentication import AuthCredentials
+
+from regtech_api_commons.api.authorization import (
+    AuthorizationPolicy,
+    AuthorizationSettings,
+    get_authorization_policy,
+    reload_authorization_policy,
+    scope_set,
+)
+
+
+def test_default_admin_scopes():
+    policy = AuthorizationPolicy.from_settings(AuthorizationSettings())
+    assert policy.admin_scopes == frozenset({"query-groups", "manage-users"})
+    assert policy.is_admin(AuthCredentials(["query-groups", "manage-users", "authenticated"]))
+    assert not policy.is_admin(AuthCredentials(["query-groups", "authenticated"]))
+
+
+def test_admin_scopes_from_env(monkeypatch):
+    monkeypatch.setenv("ADMIN_SCOPES", "manage-users, view-users")
+    try:
+        policy = reload_authorization_policy()
+        assert get_authorization_policy() is policy
+        assert policy.admin_scopes == frozenset({"manage-users", "view-users"})
+        assert policy.is_admin(AuthCredentials(["manage-users", "view-users"]))
+        assert not policy.is_admin(AuthCredentials(["query-groups", "manage-users"]))
+    finally:
+        monkeypatch.delenv("ADMIN_SCOPES")
+        reload_authorization_policy()
+
+
+def test_empty_admin_scopes_grants_nobody_admin():
+    policy = AuthorizationPolicy(["", " "])
+    assert not policy.is_admin(AuthCredentials(["authenticated"]))
+
+
+def test_reload_with_policy():
+    custom = AuthorizationPolicy(["custom-admin"])
+    try:
+        assert reload_authorization_policy(custom) is custom
+        assert get_authorization_policy().is_admin(AuthCredentials(["custom-admin"]))
+    finally:
+        reload_authorization_policy()
+
+
+def test_scope_set():
+    assert scope_set(AuthCredentials(["a", "b"])) == frozenset({"a", "b"})
+
+    class PrecomputedCredentials(AuthCredentials):
+        scope_set = frozenset({"precomputed"})
+
+    assert scope_set(PrecomputedCredentials(["a"])) == frozenset({"precomputed"})
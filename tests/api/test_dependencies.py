@@ -1,21 +1,25 @@
 from http import HTTPStatus
-from typing import Tuple
+from typing import List, Tuple
 
 import httpx
 import pytest
 from fastapi import Request
 from fastapi.exceptions import HTTPException
-from pytest_mock import MockerFixture
 from starlette.authentication import AuthCredentials, UnauthenticatedUser, BaseUser
 
 from regtech_api_commons.api.dependencies import (
+    fetch_lei_status,
     parse_leis,
     verify_institution_search,
     verify_lei,
+    verify_leis,
     verify_user_lei_relation,
 )
 from regtech_api_commons.api.exceptions import RegTechHttpException
+from regtech_api_commons.api.http_client import SharedHttpClient
+from regtech_api_commons.api.lei_status import LeiStatusCache
 from regtech_api_commons.models.auth import AuthenticatedUser
+from regtech_api_commons.observability.metrics import INSTITUTIONS_API_SECONDS
 
 
 @pytest.fixture
@@ -48,24 +52,115 @@ def unauthed_context() -> Tuple[AuthCredentials, BaseUser]:
     return AuthCredentials("unauthenticated"), UnauthenticatedUser()
 
 
-def test_verify_lei_dependency_inactive(mocker: MockerFixture):
-    mock_user_fi_service = mocker.patch("regtech_api_commons.api.dependencies.httpx.get")
-    mock_user_fi_service.return_value = httpx.Response(200, json={"is_active": False})
-    lei_check = verify_lei("test")
+def mock_http_client(response: httpx.Response, requests: List[httpx.Request] | None = None) -> SharedHttpClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if requests is not None:
+            requests.append(request)
+        return response
+
+    return SharedHttpClient(transport=httpx.MockTransport(handler))
+
+
+async def test_verify_lei_dependency_inactive():
+    lei_check = verify_lei("http://institutions/", mock_http_client(httpx.Response(200, json={"is_active": False})))
     with pytest.raises(HTTPException) as http_exc:
         request = Request(scope={"type": "http", "headers": [(b"authorization", b"123")]})
-        lei_check(request=request, lei="1234567890ZXWVUTSR00")
+        await lei_check(request=request, lei="1234567890ZXWVUTSR00")
     assert isinstance(http_exc.value, HTTPException)
     assert http_exc.value.status_code == 403
     assert http_exc.value.detail == "LEI 1234567890ZXWVUTSR00 is in an inactive state."
 
 
-def test_verify_lei_dependency_active(mocker: MockerFixture):
-    mock_user_fi_service = mocker.patch("regtech_api_commons.api.dependencies.httpx.get")
-    mock_user_fi_service.return_value = httpx.Response(200, json={"is_active": True})
-    lei_check = verify_lei("test")
+async def test_verify_lei_dependency_active():
+    requests = []
+    http_client = mock_http_client(httpx.Response(200, json={"is_active": True}), requests)
+    lei_check = verify_lei("http://institutions/", http_client)
+    request = Request(scope={"type": "http", "headers": [(b"authorization", b"123")]})
+    await lei_check(request=request, lei="1234567890ZXWVUTSR00")
+    await lei_check(request=request, lei="1234567890ZXWVUTSR00")
+    assert [str(r.url) for r in requests] == ["http://institutions/1234567890ZXWVUTSR00"] * 2
+    assert requests[0].headers["authorization"] == "123"
+    await http_client.aclose()
+
+
+async def test_verify_lei_dependency_with_status_cache():
+    requests = []
+    http_client = mock_http_client(httpx.Response(200, json={"is_active": False}), requests)
+    lei_check = verify_lei("http://institutions/", http_client, LeiStatusCache())
     request = Request(scope={"type": "http", "headers": [(b"authorization", b"123")]})
-    lei_check(request=request, lei="1234567890ZXWVUTSR00")
+    for _ in range(3):
+        with pytest.raises(HTTPException) as http_exc:
+            await lei_check(request=request, lei="1234567890ZXWVUTSR00")
+        assert http_exc.value.status_code == 403
+    assert len(requests) == 1
+    await http_client.aclose()
+
+
+async def test_fetch_lei_status_outcomes():
+    def outcomes():
+        return tuple(INSTITUTIONS_API_SECONDS.count(endpoint="lei", outcome=o) for o in ("success", "error"))
+
+    cases = [
+        (httpx.Response(200, json={"is_active": True}), None, (1, 0)),
+        (httpx.Response(200, json={"detail": "unexpected"}), KeyError, (0, 1)),
+        (httpx.Response(404, json={"is_active": False}), httpx.HTTPStatusError, (0, 1)),
+    ]
+    for response, error, (successes, errors) in cases:
+        http_client = mock_http_client(response)
+        before = outcomes()
+        if error is None:
+            assert await fetch_lei_status(http_client, "http://institutions/", "TESTLEI", "123") is True
+        else:
+            with pytest.raises(error):
+                await fetch_lei_status(http_client, "http://institutions/", "TESTLEI", "123")
+        assert outcomes() == (before[0] + successes, before[1] + errors)
+        await http_client.aclose()
+
+
+async def test_verify_leis_dependency():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"is_active": not request.url.path.endswith("INACTIVE")})
+
+    http_client = SharedHttpClient(transport=httpx.MockTransport(handler))
+    leis_check = verify_leis("http://institutions/", http_client, max_concurrency=2)
+    request = Request(scope={"type": "http", "headers": [(b"authorization", b"123")]})
+    await leis_check(request=request, leis=["LEI1", "LEI2", "LEI1"])
+    assert len(requests) == 2
+    await leis_check(request=request, leis=None)
+    await leis_check(request=request, leis=parse_leis([","]))
+    assert len(requests) == 2
+    await leis_check(request=request, leis=parse_leis(["LEI1,"]))
+    assert len(requests) == 3
+    assert requests[-1].url.path == "/LEI1"
+
+    with pytest.raises(HTTPException) as http_exc:
+        await leis_check(request=request, leis=["LEI1", "LEI1INACTIVE", "LEI2INACTIVE"])
+    assert http_exc.value.status_code == 403
+    assert http_exc.value.detail == "LEIs (['LEI1INACTIVE', 'LEI2INACTIVE']) are in an inactive state."
+    await http_client.aclose()
+
+
+async def test_verify_leis_dependency_bulk():
+    requests = []
+    http_client = mock_http_client(
+        httpx.Response(200, json=[{"lei": "LEI1", "is_active": True}, {"lei": "LEI2", "is_active": False}]), requests
+    )
+    status_cache = LeiStatusCache()
+    leis_check = verify_leis("http://institutions/", http_client, status_cache, bulk_url="http://institutions")
+    request = Request(scope={"type": "http", "headers": [(b"authorization", b"123")]})
+    with pytest.raises(HTTPException) as http_exc:
+        await leis_check(request=request, leis=["LEI1", "LEI2", "LEI3"])
+    assert http_exc.value.detail == "LEIs (['LEI2', 'LEI3']) are in an inactive state."
+    assert len(requests) == 1
+    assert requests[0].url.params["leis"] == "LEI1,LEI2,LEI3"
+
+    await leis_check(request=request, leis=parse_leis(["LEI1,"]))
+    assert len(requests) == 1
+    assert status_cache.get("LEI2") is False
+    await http_client.aclose()
 
 
 def test_verify_user_lei_relation_admin(admin_context: Tuple[AuthCredentials, AuthenticatedUser]):
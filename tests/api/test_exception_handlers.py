@@ -1,7 +1,10 @@
 from http import HTTPStatus
 import json
+from uuid import UUID
 
-from fastapi import HTTPException, Request
+import logging
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 import pytest
@@ -9,6 +12,11 @@ from pytest_mock import MockerFixture
 from regtech_api_commons.api.exception_handlers import (
     ERROR_NAME,
     ERROR_DETAIL,
+    ERROR_COUNT,
+    ErrorLogPolicy,
+    ExceptionHandlerSettings,
+    register_exception_handlers,
+    reload_exception_handler_settings,
     regtech_http_exception_handler,
     request_validation_error_handler,
     http_exception_handler,
@@ -16,6 +24,8 @@ from regtech_api_commons.api.exception_handlers import (
     log as exception_logger,
 )
 from regtech_api_commons.api.exceptions import RegTechHttpException
+from regtech_api_commons.api.responses import FastJSONResponse
+from regtech_api_commons.observability.metrics import EXCEPTION_HANDLER_RESPONSES
 
 
 @pytest.fixture
@@ -54,6 +64,15 @@ async def test_regtech_http_exception_handler_show_raw_nested_detail(mock_reques
     assert content[ERROR_DETAIL] == {"foo": "bar"}
 
 
+async def test_regtech_http_exception_handler_show_raw_non_str_keys(mock_request: Request):
+    e = RegTechHttpException(
+        HTTPStatus.BAD_REQUEST, name="Test Exception", detail={1: "bar", None: ["baz"]}, show_raw_detail=True
+    )
+    response = await regtech_http_exception_handler(mock_request, e)
+    assert response.status_code == e.status_code
+    assert json.loads(response.body)[ERROR_DETAIL] == {"1": "bar", "null": ["baz"]}
+
+
 async def test_request_validation_error_handler(mock_request: Request):
     errors = [{"loc": "test1", "msg": "error1"}, {"loc": "test2", "msg": "error2"}]
     rve = RequestValidationError(errors=errors)
@@ -85,3 +104,90 @@ async def test_general_exception_handler(mock_request: Request):
     content = json.loads(response.body)
     assert content[ERROR_NAME] == HTTPStatus.INTERNAL_SERVER_ERROR.phrase
     assert content[ERROR_DETAIL] == "server error"
+
+
+async def test_request_validation_error_handler_structured(mock_request: Request):
+    errors = [
+        {"type": "missing", "loc": ("body", i), "msg": "Field required", "input": {"big": "input"}} for i in range(5)
+    ]
+    rve = RequestValidationError(errors=errors)
+    reload_exception_handler_settings(
+        ExceptionHandlerSettings(validation_error_detail="structured", validation_error_limit=2)
+    )
+    try:
+        response = await request_validation_error_handler(mock_request, rve)
+    finally:
+        reload_exception_handler_settings()
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    content = json.loads(response.body)
+    assert content[ERROR_DETAIL] == [
+        {"type": "missing", "loc": ["body", 0], "msg": "Field required"},
+        {"type": "missing", "loc": ["body", 1], "msg": "Field required"},
+    ]
+    assert content[ERROR_COUNT] == 5
+
+
+def test_fast_json_response_renders_unknown_types():
+    response = FastJSONResponse(content={"id": UUID(int=1), "nested": [1, "two"]})
+    assert json.loads(response.body) == {"id": str(UUID(int=1)), "nested": [1, "two"]}
+
+
+def test_error_log_policy_server_errors_log_traceback(mocker: MockerFixture):
+    exception_log_spy = mocker.patch.object(exception_logger, "exception")
+    e = RegTechHttpException(HTTPStatus.BAD_GATEWAY, detail="upstream failure")
+    policy = ErrorLogPolicy()
+    policy.log("Handling RegTechHttpException.", e.status_code, e)
+    policy.log("Handling RegTechHttpException.", e.status_code, e)
+    assert exception_log_spy.call_count == 2
+
+
+def test_error_log_policy_rate_limits_client_errors(mocker: MockerFixture):
+    exception_log_spy = mocker.patch.object(exception_logger, "exception")
+    log_spy = mocker.patch.object(exception_logger, "log")
+    now = [0.0]
+    policy = ErrorLogPolicy(rate_limit_interval=60, clock=lambda: now[0])
+    e = RegTechHttpException(HTTPStatus.FORBIDDEN, detail="LEI not associated")
+
+    for _ in range(3):
+        policy.log("Handling RegTechHttpException.", e.status_code, e)
+    policy.log("Handling RegTechHttpException.", e.status_code, RegTechHttpException(HTTPStatus.NOT_FOUND))
+    assert log_spy.call_count == 2
+    assert log_spy.call_args_list[0].args[0] == logging.WARNING
+    assert log_spy.call_args_list[0].kwargs["exc_info"] is None
+
+    now[0] = 61
+    policy.log("Handling RegTechHttpException.", e.status_code, e)
+    assert log_spy.call_count == 3
+    assert log_spy.call_args.args[-1] == 2
+    exception_log_spy.assert_not_called()
+
+
+def test_error_log_policy_samples_client_errors(mocker: MockerFixture):
+    log_spy = mocker.patch.object(exception_logger, "log")
+    samples = iter([0.9, 0.05])
+    policy = ErrorLogPolicy(client_error_sample_rate=0.1, rate_limit_interval=0, sampler=lambda: next(samples))
+    e = StarletteHTTPException(HTTPStatus.NOT_FOUND)
+    policy.log("Handling HTTPException.", e.status_code, e)
+    policy.log("Handling HTTPException.", e.status_code, e)
+    log_spy.assert_called_once()
+
+
+async def test_register_exception_handlers(mocker: MockerFixture, mock_request: Request):
+    log_spy = mocker.patch.object(exception_logger, "log")
+    app = FastAPI()
+    policy = ErrorLogPolicy(client_error_traceback=True)
+    register_exception_handlers(app, log_policy=policy)
+    try:
+        assert app.exception_handlers[RegTechHttpException] is regtech_http_exception_handler
+        assert app.exception_handlers[Exception] is general_exception_handler
+        e = StarletteHTTPException(HTTPStatus.FORBIDDEN, "test error")
+        await http_exception_handler(mock_request, e)
+        assert log_spy.call_args.kwargs["exc_info"] is e
+    finally:
+        register_exception_handlers(app, log_policy=ErrorLogPolicy())
+
+
+async def test_handlers_count_responses(mock_request: Request):
+    before = EXCEPTION_HANDLER_RESPONSES.value(handler="http_exception", status=HTTPStatus.NOT_FOUND)
+    await http_exception_handler(mock_request, StarletteHTTPException(HTTPStatus.NOT_FOUND))
+    assert EXCEPTION_HANDLER_RESPONSES.value(handler="http_exception", status=HTTPStatus.NOT_FOUND) == before + 1
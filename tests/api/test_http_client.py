@@ -0,0 +1,31 @@
+import httpx
+
+from regtech_api_commons.api.http_client import HttpClientSettings, SharedHttpClient
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("HTTP_CLIENT_TIMEOUT", "3")
+    monkeypatch.setenv("HTTP_CLIENT_MAX_CONNECTIONS", "7")
+    settings = HttpClientSettings()
+    assert settings.timeout == 3
+    assert settings.max_connections == 7
+    assert settings.http2 is False
+
+
+async def test_client_is_shared_and_configured():
+    http_client = SharedHttpClient(HttpClientSettings(timeout=3, connect_timeout=1, max_connections=7))
+    client = http_client.client
+    assert http_client.client is client
+    assert client.timeout == httpx.Timeout(3, connect=1)
+    await http_client.aclose()
+    assert client.is_closed
+    assert http_client.client is not client
+    await http_client.aclose()
+
+
+async def test_lifespan_closes_client():
+    http_client = SharedHttpClient()
+    async with http_client.lifespan():
+        client = http_client.client
+        assert not client.is_closed
+    assert client.is_closed
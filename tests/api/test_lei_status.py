@@ -0,0 +1,74 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from regtech_api_commons.api.lei_status import LeiStatusCache
+
+
+async def test_get_or_fetch_caches_status():
+    status_cache = LeiStatusCache()
+    fetch = AsyncMock(return_value=True)
+    assert await status_cache.get_or_fetch("TESTLEI", fetch) is True
+    assert await status_cache.get_or_fetch("TESTLEI", fetch) is True
+    fetch.assert_awaited_once()
+
+
+async def test_separate_ttls_for_active_and_inactive():
+    status_cache = LeiStatusCache(active_ttl=300, inactive_ttl=0)
+    inactive_fetch = AsyncMock(return_value=False)
+    await status_cache.get_or_fetch("INACTIVELEI", inactive_fetch)
+    await status_cache.get_or_fetch("INACTIVELEI", inactive_fetch)
+    assert inactive_fetch.await_count == 2
+
+    active_fetch = AsyncMock(return_value=True)
+    await status_cache.get_or_fetch("ACTIVELEI", active_fetch)
+    await status_cache.get_or_fetch("ACTIVELEI", active_fetch)
+    active_fetch.assert_awaited_once()
+
+
+async def test_invalidate():
+    status_cache = LeiStatusCache()
+    fetch = AsyncMock(side_effect=[True, False])
+    assert await status_cache.get_or_fetch("TESTLEI", fetch) is True
+    status_cache.invalidate("TESTLEI")
+    assert await status_cache.get_or_fetch("TESTLEI", fetch) is False
+    assert fetch.await_count == 2
+
+
+async def test_invalidate_during_fetch():
+    status_cache = LeiStatusCache()
+    release = asyncio.Event()
+
+    async def stale_fetch():
+        await release.wait()
+        return True
+
+    lookup = asyncio.ensure_future(status_cache.get_or_fetch("TESTLEI", stale_fetch))
+    await asyncio.sleep(0)
+    status_cache.invalidate("TESTLEI")
+    release.set()
+    assert await lookup is True
+    assert status_cache.get("TESTLEI") is None
+    assert await status_cache.get_or_fetch("TESTLEI", AsyncMock(return_value=False)) is False
+
+
+async def test_concurrent_lookups_are_coalesced():
+    status_cache = LeiStatusCache()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return True
+
+    fetch_mock = AsyncMock(side_effect=fetch)
+    results = await asyncio.gather(*[status_cache.get_or_fetch("TESTLEI", fetch_mock) for _ in range(10)])
+    assert results == [True] * 10
+    fetch_mock.assert_awaited_once()
+
+
+async def test_failed_fetch_is_not_cached():
+    status_cache = LeiStatusCache()
+    fetch = AsyncMock(side_effect=[KeyError("is_active"), True])
+    with pytest.raises(KeyError):
+        await status_cache.get_or_fetch("TESTLEI", fetch)
+    assert await status_cache.get_or_fetch("TESTLEI", fetch) is True
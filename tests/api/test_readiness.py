@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from regtech_api_commons.api.http_client import SharedHttpClient
+from regtech_api_commons.api.readiness import ReadinessMonitor, http_probe
+from regtech_api_commons.api.router_wrapper import Router
+
+
+async def ok_probe():
+    return None
+
+
+async def failing_probe():
+    raise ConnectionError("keycloak down")
+
+
+async def slow_probe():
+    await asyncio.sleep(1)
+
+
+async def test_check_records_results():
+    monitor = ReadinessMonitor(timeout=0.01)
+    monitor.add_probe("jwks", ok_probe)
+    assert not monitor.ready
+
+    results = await monitor.check()
+    assert results["jwks"].ok
+    assert monitor.ready
+
+    monitor.add_probe("institutions", failing_probe)
+    monitor.add_probe("admin", slow_probe)
+    assert not monitor.ready
+    results = await monitor.check()
+    assert results["institutions"].detail == "ConnectionError: keycloak down"
+    assert results["admin"].detail == "timed out"
+    assert not monitor.ready
+    assert monitor.status()["status"] == "not ready"
+
+
+async def test_lifespan_probes_in_background():
+    calls = []
+
+    async def probe():
+        calls.append(1)
+
+    monitor = ReadinessMonitor(interval=0.01)
+    monitor.add_probe("probe", probe)
+    async with monitor.lifespan():
+        await asyncio.sleep(0.05)
+        assert monitor.ready
+    count = len(calls)
+    assert count > 1
+    await asyncio.sleep(0.03)
+    assert len(calls) == count
+
+
+async def test_http_probe():
+    statuses = iter([200, 404, 503])
+    http_client = SharedHttpClient(transport=httpx.MockTransport(lambda request: httpx.Response(next(statuses))))
+    monitor = ReadinessMonitor()
+    monitor.add_probe("institutions", http_probe("http://institutions/", http_client=http_client))
+
+    assert (await monitor.check())["institutions"].ok
+    assert (await monitor.check())["institutions"].ok
+    assert not (await monitor.check())["institutions"].ok
+    await http_client.aclose()
+
+
+async def test_router_readiness_endpoint():
+    monitor = ReadinessMonitor()
+    monitor.add_probe("jwks", ok_probe)
+    app = FastAPI()
+    app.include_router(Router(readiness=monitor))
+    client = TestClient(app)
+
+    response = client.get("/readiness")
+    assert response.status_code == 503
+    assert response.json() == {"status": "not ready", "checks": {}}
+
+    await monitor.check()
+    response = client.get("/readiness")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    assert response.json()["checks"]["jwks"]["ok"]
+    assert client.get("/healthcheck").json() == "Service is up."
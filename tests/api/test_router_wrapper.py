@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from regtech_api_commons.api.router_wrapper import Router
+from regtech_api_commons.api.router_wrapper import Router, TrailingSlashMiddleware
 
 router = Router()
 app = FastAPI()
@@ -38,3 +38,35 @@ def test_get_api_route_wrong_path():
     response = client.get("/item/foo/")
     assert response.status_code == 404, response.text
     assert response.json() != {"item_id": "foo"}
+
+
+single_route_router = Router(duplicate_trailing_slash=False)
+single_route_app = FastAPI()
+single_route_app.add_middleware(TrailingSlashMiddleware)
+
+
+@single_route_router.api_route("/items/{item_id}/", methods=["GET"])
+def get_single_route_items(item_id: str):
+    return {"item_id": item_id}
+
+
+single_route_app.include_router(single_route_router)
+
+single_route_client = TestClient(single_route_app)
+
+
+def test_single_route_registration():
+    assert [route.path for route in single_route_router.routes] == ["/healthcheck", "/items/{item_id}"]
+    assert len(router.routes) == 4
+
+
+def test_single_route_normalizes_trailing_slash():
+    for path in ["/items/foo", "/items/foo/", "/items/foo/?q=1"]:
+        response = single_route_client.get(path)
+        assert response.status_code == 200, response.text
+        assert response.json() == {"item_id": "foo"}
+    for path in ["/items/foo//", "/items//", "/"]:
+        response = single_route_client.get(path, follow_redirects=False)
+        assert response.status_code == client.get(path, follow_redirects=False).status_code
+    assert single_route_client.get("/healthcheck/").json() == "Service is up."
+    assert single_route_client.get("/item/foo/").status_code == 404
@@ -69,3 +69,49 @@ def test_is_authenticated():
     }
 
     assert AuthenticatedUser.from_claim(test_claims).is_authenticated is True
+
+
+def test_institution_set():
+    test_claims = {
+        "name": "test",
+        "preferred_username": "test_user",
+        "email": "test@local.host",
+        "sub": "testuser123",
+        "institutions": ["/TEST1LEI", "/TEST2LEI/TEST2CHILDLEI", "/"],
+    }
+    user = AuthenticatedUser.from_claim(test_claims)
+    assert user.institution_set == frozenset({"TEST1LEI", "TEST2CHILDLEI"})
+    assert user == AuthenticatedUser.from_claim(test_claims)
+    assert "_institution_set" not in user.model_dump()
+
+    kc_user = RegTechUser.from_kc({"id": "testuser123"}, [{"path": "/TEST1LEI"}])
+    assert kc_user.institution_set == frozenset({"TEST1LEI"})
+    assert RegTechUser.from_claim({}).institution_set == frozenset()
+
+
+def test_institution_set_follows_institutions():
+    for validate in (True, False):
+        user = AuthenticatedUser.from_claim({"sub": "testuser123", "institutions": ["/TEST1LEI"]}, validate=validate)
+        user.institutions = ["TEST2LEI", ""]
+        assert user.institution_set == frozenset({"TEST2LEI"})
+
+        copy = user.model_copy(update={"institutions": ["TEST3LEI"]})
+        assert copy.institution_set == frozenset({"TEST3LEI"})
+        assert user.institution_set == frozenset({"TEST2LEI"})
+        assert user.model_copy().institution_set == frozenset({"TEST2LEI"})
+
+
+def test_from_claims_without_validation():
+    test_claims = {
+        "name": "test",
+        "preferred_username": "test_user",
+        "email": "test@local.host",
+        "sub": "testuser123",
+        "institutions": ["/TEST1LEI", "/TEST2LEI/TEST2CHILDLEI"],
+    }
+    user = AuthenticatedUser.from_claim(test_claims, validate=False)
+    assert isinstance(user, AuthenticatedUser)
+    assert user == AuthenticatedUser.from_claim(test_claims)
+    assert user.is_authenticated is True
+    assert user.institution_set == frozenset({"TEST1LEI", "TEST2CHILDLEI"})
+    assert user.model_dump() == AuthenticatedUser.from_claim(test_claims).model_dump()
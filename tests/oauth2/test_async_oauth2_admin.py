@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+from keycloak import KeycloakError
+from pytest_mock import MockerFixture
+
+from regtech_api_commons.api.exceptions import RegTechHttpException
+from regtech_api_commons.models.auth import RegTechUser
+from regtech_api_commons.oauth2.async_oauth2_admin import AsyncOAuth2Admin
+from regtech_api_commons.oauth2.config import KeycloakSettings
+from regtech_api_commons.oauth2.oauth2_admin import BaseOAuth2Admin, OAuth2Admin
+
+kc_settings = KeycloakSettings(
+    **{
+        "kc_url": "http://localhost",
+        "kc_realm": "",
+        "kc_admin_client_id": "",
+        "kc_admin_client_secret": "",
+        "kc_realm_url": "http://localhost",
+        "auth_url": "http://localhost",
+        "token_url": "http://localhost",
+        "certs_url": "http://localhost",
+        "auth_client": "regtech-client",
+    }
+)
+oauth2_admin = AsyncOAuth2Admin(kc_settings)
+
+
+def test_async_admin_is_not_an_oauth2_admin():
+    # its admin methods are coroutines, so it must not pass where a blocking OAuth2Admin is expected
+    assert isinstance(oauth2_admin, BaseOAuth2Admin)
+    assert not isinstance(oauth2_admin, OAuth2Admin)
+
+
+async def test_get_user_fetches_concurrently(mocker: MockerFixture):
+    both_started = asyncio.Event()
+    started = []
+
+    async def get_user(user_id):
+        started.append("user")
+        if len(started) == 2:
+            both_started.set()
+        await asyncio.wait_for(both_started.wait(), 1)
+        return {"email": "test@local.host", "firstName": "test", "id": user_id, "lastName": "user", "username": "u1"}
+
+    async def get_user_groups(user_id):
+        started.append("groups")
+        if len(started) == 2:
+            both_started.set()
+        await asyncio.wait_for(both_started.wait(), 1)
+        return [{"id": "test-id-1", "name": "TEST1LEI", "path": "/TEST1LEI"}]
+
+    mocker.patch("keycloak.KeycloakAdmin.a_get_user", side_effect=get_user)
+    mocker.patch("keycloak.KeycloakAdmin.a_get_user_groups", side_effect=get_user_groups)
+
+    regtech_user = await oauth2_admin.get_user("testuser123")
+    assert isinstance(regtech_user, RegTechUser)
+    assert regtech_user.id == "testuser123"
+    assert regtech_user.institutions == ["TEST1LEI"]
+
+
+async def test_update_user_failure(mocker: MockerFixture):
+    mocker.patch("keycloak.KeycloakAdmin.a_update_user").side_effect = KeycloakError("test", 500)
+    log_mock = mocker.patch("regtech_api_commons.oauth2.async_oauth2_admin.log")
+    with pytest.raises(RegTechHttpException) as e:
+        await oauth2_admin.update_user("test", {"foo": "bar"})
+    log_mock.exception.assert_called()
+    assert e.value.status_code == 500
+
+
+async def test_upsert_group(mocker: MockerFixture):
+    lei = "TESTLEI"
+    mock_get_group = mocker.patch("keycloak.KeycloakAdmin.a_get_group_by_path")
+    mock_get_group.return_value = None
+    mocker.patch("keycloak.KeycloakAdmin.a_create_group").return_value = "new-id"
+    mocker.patch("regtech_api_commons.oauth2.async_oauth2_admin.log")
+    assert await oauth2_admin.upsert_group(lei=lei, name="Test Name") == "new-id"
+
+    mock_get_group.return_value = {"id": "existing-id", "name": lei}
+    mock_update_group = mocker.patch("keycloak.KeycloakAdmin.a_update_group")
+    assert await oauth2_admin.upsert_group(lei=lei, name="Test Name") == "existing-id"
+    mock_update_group.assert_awaited_once_with("existing-id", {"name": lei})
+
+
+async def test_associate_to_lei(mocker: MockerFixture):
+    lei = "123456789TESTBANK123"
+    mocker.patch("keycloak.KeycloakAdmin.a_get_group_by_path").return_value = {"id": "group-id"}
+    mock_group_user_add = mocker.patch("keycloak.KeycloakAdmin.a_group_user_add")
+    await oauth2_admin.associate_to_lei(user_id="test-id", lei=lei)
+    mock_group_user_add.assert_awaited_once_with("test-id", "group-id")
+
+    with pytest.raises(ValueError):
+        await oauth2_admin.associate_to_lei(user_id="test-id", lei="TESTLEI")
+
+
+async def test_bulk_associate_to_leis(mocker: MockerFixture):
+    groups = {"/123456789TESTBANK123": {"id": "group-1", "name": "123456789TESTBANK123"}}
+    mock_get_group = mocker.patch("keycloak.KeycloakAdmin.a_get_group_by_path")
+    mock_get_group.side_effect = lambda path: groups.get(path, {"error": "Group path does not exist"})
+    mock_create_group = mocker.patch("keycloak.KeycloakAdmin.a_create_group")
+    mock_create_group.return_value = "group-2"
+    mock_group_user_add = mocker.patch("keycloak.KeycloakAdmin.a_group_user_add")
+
+    results = await oauth2_admin.bulk_associate_to_leis(
+        "test-id", {"123456789TESTBANK123", "123456789TESTBANK234", "TESTLEI"}
+    )
+
+    mock_create_group.assert_awaited_once_with({"name": "123456789TESTBANK234"}, skip_exists=True)
+    assert mock_group_user_add.await_count == 2
+    assert mock_get_group.await_count == 2
+    assert results["123456789TESTBANK123"].success
+    assert results["123456789TESTBANK234"].group_created
+    assert not results["TESTLEI"].success
+
+
+async def test_delete_group(mocker: MockerFixture):
+    mocker.patch("keycloak.KeycloakAdmin.a_get_group_by_path").return_value = {"id": "group-id"}
+    mock_delete_group = mocker.patch("keycloak.KeycloakAdmin.a_delete_group")
+    await oauth2_admin.delete_group("TESTLEI")
+    mock_delete_group.assert_awaited_once_with("group-id")
+
+    mock_delete_group.side_effect = KeycloakError("test", response_code=500)
+    mocker.patch("regtech_api_commons.oauth2.async_oauth2_admin.log")
+    with pytest.raises(RegTechHttpException) as e:
+        await oauth2_admin.delete_group("TESTLEI")
+    assert e.value.status_code == 500
+
+
+async def test_get_user_cache(mocker: MockerFixture):
+    cached_admin = AsyncOAuth2Admin(KeycloakSettings(**{**kc_settings.model_dump(), "user_cache_size": 10}))
+    mock_get_user = mocker.patch("keycloak.KeycloakAdmin.a_get_user")
+    mock_get_user.return_value = {"email": "test@local.host", "id": "testuser123", "username": "user1"}
+    mocker.patch("keycloak.KeycloakAdmin.a_get_user_groups").return_value = []
+    mocker.patch("keycloak.KeycloakAdmin.a_update_user")
+
+    await cached_admin.get_user("testuser123")
+    await cached_admin.get_user("testuser123")
+    mock_get_user.assert_awaited_once()
+
+    await cached_admin.update_user("testuser123", {"firstName": "new"})
+    await cached_admin.get_user("testuser123")
+    assert mock_get_user.await_count == 2
+
+
+async def test_upsert_group_with_stale_cached_id(mocker: MockerFixture):
+    cached_admin = AsyncOAuth2Admin(KeycloakSettings(**{**kc_settings.model_dump(), "group_cache_size": 10}))
+    lei = "123456789TESTBANK123"
+    cached_admin._cache_group_id(lei, "deleted-group")
+    mocker.patch("keycloak.KeycloakAdmin.a_update_group").side_effect = KeycloakError("test", 404)
+    mocker.patch("keycloak.KeycloakAdmin.a_get_group_by_path").return_value = {"error": "Group path does not exist"}
+    mocker.patch("keycloak.KeycloakAdmin.a_create_group").return_value = "group-2"
+    mocker.patch("regtech_api_commons.oauth2.async_oauth2_admin.log")
+    assert await cached_admin.upsert_group(lei, "Test Name") == "group-2"
+
+
+async def test_delete_missing_group(mocker: MockerFixture):
+    mocker.patch("keycloak.KeycloakAdmin.a_get_group_by_path").return_value = {"error": "Group path does not exist"}
+    mock_delete_group = mocker.patch("keycloak.KeycloakAdmin.a_delete_group")
+    mocker.patch("regtech_api_commons.oauth2.async_oauth2_admin.log")
+    with pytest.raises(RegTechHttpException) as e:
+        await oauth2_admin.delete_group("123456789TESTBANK123")
+    assert e.value.status_code == 404
+    mock_delete_group.assert_not_awaited()
@@ -25,3 +25,16 @@ def test_jwt_opts_invalid_values():
 
 def test_all_envs_optional():
     KeycloakSettings()
+
+
+def test_jwks_cache_settings():
+    kc_settings = KeycloakSettings()
+    assert kc_settings.jwks_ttl == 300
+    assert kc_settings.jwks_min_refresh_interval == 10
+
+    assert kc_settings.jwks_snapshot_path is None
+
+    kc_settings = KeycloakSettings(jwks_ttl="60", jwks_min_refresh_interval="5", jwks_snapshot_path="/tmp/jwks.json")
+    assert kc_settings.jwks_ttl == 60
+    assert kc_settings.jwks_min_refresh_interval == 5
+    assert kc_settings.jwks_snapshot_path == "/tmp/jwks.json"
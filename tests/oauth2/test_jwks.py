@@ -0,0 +1,304 @@
+import asyncio
+import base64
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, Mock
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from regtech_api_commons.oauth2.jwks import JwksCache, JwksKeyStore, JwksSnapshot
+
+
+def to_jwk(private_key: rsa.RSAPrivateKey, kid: str) -> dict:
+    public_numbers = private_key.public_key().public_numbers()
+    return {
+        "kty": "RSA",
+        "kid": kid,
+        "use": "sig",
+        "n": base64.urlsafe_b64encode(
+            public_numbers.n.to_bytes((public_numbers.n.bit_length() + 7) // 8, "big")
+        ).decode("utf-8"),
+        "e": base64.urlsafe_b64encode(
+            public_numbers.e.to_bytes((public_numbers.e.bit_length() + 7) // 8, "big")
+        ).decode("utf-8"),
+    }
+
+
+def test_key_store_indexes_by_kid():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    store = JwksKeyStore({"keys": [to_jwk(private_key, "kid-1")]})
+
+    assert len(store) == 1
+    assert "kid-1" in store
+    key = store.get("kid-1")
+    assert isinstance(key, jwt.PyJWK)
+    token = jwt.encode({"sub": "test"}, private_key, algorithm="RS256", headers={"kid": "kid-1"})
+    assert jwt.decode(token, key=key)["sub"] == "test"
+    assert store.get("kid-2") is None
+    assert store.get(None) is None
+
+
+def test_key_store_skips_unusable_keys():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    store = JwksKeyStore(
+        {
+            "keys": [
+                to_jwk(private_key, "sig-kid"),
+                {"kty": "RSA", "kid": "enc-kid", "use": "enc", "alg": "RSA-OAEP", "n": "AQAB", "e": "AQAB"},
+                {"kty": "RSA", "n": "AQAB", "e": "AQAB"},
+            ]
+        }
+    )
+    assert len(store) == 1
+    assert "enc-kid" not in store
+
+
+def test_key_store_load_replaces_keys():
+    store = JwksKeyStore()
+    assert len(store) == 0
+    store.load({"keys": [to_jwk(rsa.generate_private_key(public_exponent=65537, key_size=2048), "kid-1")]})
+    assert "kid-1" in store
+    store.load({"keys": [to_jwk(rsa.generate_private_key(public_exponent=65537, key_size=2048), "kid-2")]})
+    assert "kid-1" not in store
+    assert "kid-2" in store
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cache_fetches_on_first_use_and_serves_from_cache():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    fetch = Mock(return_value={"keys": [to_jwk(key, "kid-1")]})
+    cache = JwksCache(fetch, ttl=300, min_refresh_interval=10, clock=FakeClock())
+
+    assert cache.get_key("kid-1") is not None
+    assert cache.get_key("kid-1") is not None
+    fetch.assert_called_once()
+
+
+def test_cache_refreshes_after_ttl():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    fetch = Mock(return_value={"keys": [to_jwk(key, "kid-1")]})
+    clock = FakeClock()
+    cache = JwksCache(fetch, ttl=300, min_refresh_interval=10, clock=clock)
+
+    cache.get_key("kid-1")
+    clock.now += 299
+    cache.get_key("kid-1")
+    assert fetch.call_count == 1
+    clock.now += 1
+    assert cache.is_stale()
+    cache.get_key("kid-1")
+    assert fetch.call_count == 2
+    assert not cache.is_stale()
+
+
+def test_cache_keeps_stale_keys_when_refresh_fails():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    fetch = Mock(side_effect=[{"keys": [to_jwk(key, "kid-1")]}, Exception("Keycloak down")])
+    clock = FakeClock()
+    cache = JwksCache(fetch, ttl=300, min_refresh_interval=10, clock=clock)
+
+    cache.get_key("kid-1")
+    clock.now += 300
+    assert cache.get_key("kid-1") is not None
+    assert fetch.call_count == 2
+
+
+def test_cache_refetches_on_unknown_kid():
+    old_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    new_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    fetch = Mock(side_effect=[{"keys": [to_jwk(old_key, "kid-1")]}, {"keys": [to_jwk(new_key, "kid-2")]}])
+    clock = FakeClock()
+    cache = JwksCache(fetch, ttl=300, min_refresh_interval=10, clock=clock)
+
+    cache.get_key("kid-1")
+    clock.now += 10
+    assert cache.get_key("kid-2") is not None
+    assert fetch.call_count == 2
+
+
+def test_cache_throttles_unknown_kid_refetches():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    fetch = Mock(return_value={"keys": [to_jwk(key, "kid-1")]})
+    clock = FakeClock()
+    cache = JwksCache(fetch, ttl=300, min_refresh_interval=10, clock=clock)
+
+    cache.get_key("kid-1")
+    for i in range(100):
+        assert cache.get_key(f"forged-kid-{i}") is None
+    fetch.assert_called_once()
+
+    clock.now += 10
+    assert cache.get_key("forged-kid") is None
+    assert fetch.call_count == 2
+
+
+def test_cache_single_flight_on_concurrent_misses():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    fetch_started = threading.Event()
+    release_fetch = threading.Event()
+
+    def fetch():
+        fetch_started.set()
+        release_fetch.wait(5)
+        return {"keys": [to_jwk(key, "kid-1")]}
+
+    fetch_mock = Mock(side_effect=fetch)
+    cache = JwksCache(fetch_mock, ttl=300, min_refresh_interval=0)
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        futures = [executor.submit(cache.get_key, "kid-1") for _ in range(10)]
+        fetch_started.wait(5)
+        release_fetch.set()
+        results = [future.result() for future in futures]
+
+    assert all(result is not None for result in results)
+    fetch_mock.assert_called_once()
+
+
+async def test_cache_aget_key_fetches_asynchronously():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    fetch = Mock()
+    afetch = AsyncMock(return_value={"keys": [to_jwk(key, "kid-1")]})
+    cache = JwksCache(fetch, ttl=300, min_refresh_interval=10, clock=FakeClock(), afetch=afetch)
+
+    assert await cache.aget_key("kid-1") is not None
+    assert await cache.aget_key("kid-1") is not None
+    afetch.assert_awaited_once()
+    fetch.assert_not_called()
+
+
+async def test_cache_aget_key_defaults_to_threaded_fetch():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    fetch = Mock(return_value={"keys": [to_jwk(key, "kid-1")]})
+    cache = JwksCache(fetch, ttl=300, min_refresh_interval=10, clock=FakeClock())
+
+    assert await cache.aget_key("kid-1") is not None
+    fetch.assert_called_once()
+
+
+async def test_cache_aget_key_revalidates_stale_keys_in_background():
+    old_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    new_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    afetch = AsyncMock(side_effect=[{"keys": [to_jwk(old_key, "kid-1")]}, {"keys": [to_jwk(new_key, "kid-1")]}])
+    clock = FakeClock()
+    cache = JwksCache(Mock(), ttl=300, min_refresh_interval=10, clock=clock, afetch=afetch)
+
+    old_jwk = await cache.aget_key("kid-1")
+    clock.now += 300
+    assert await cache.aget_key("kid-1") is old_jwk
+    await asyncio.sleep(0)
+    assert afetch.await_count == 2
+    assert await cache.aget_key("kid-1") is not old_jwk
+
+
+async def test_cache_aget_key_single_flight_on_concurrent_misses():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    async def afetch():
+        await asyncio.sleep(0.01)
+        return {"keys": [to_jwk(key, "kid-1")]}
+
+    afetch_mock = AsyncMock(side_effect=afetch)
+    cache = JwksCache(Mock(), ttl=300, min_refresh_interval=0, afetch=afetch_mock)
+
+    results = await asyncio.gather(*[cache.aget_key("kid-1") for _ in range(10)])
+    assert all(result is not None for result in results)
+    afetch_mock.assert_awaited_once()
+
+
+async def test_cache_awarm_fetches_once():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    afetch = AsyncMock(return_value={"keys": [to_jwk(key, "kid-1")]})
+    cache = JwksCache(Mock(), ttl=300, min_refresh_interval=0, clock=FakeClock(), afetch=afetch)
+
+    assert await cache.awarm() == 1
+    assert await cache.awarm() == 1
+    assert await cache.aget_key("kid-1") is not None
+    afetch.assert_awaited_once()
+
+
+def test_snapshot_round_trip(tmp_path):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwks = {"keys": [to_jwk(key, "kid-1")]}
+    path = tmp_path / "jwks.json"
+    snapshot = JwksSnapshot(str(path))
+
+    assert snapshot.load() is None
+    snapshot.save(jwks)
+    assert JwksSnapshot(str(path)).load() == jwks
+    assert [p.name for p in tmp_path.iterdir()] == ["jwks.json"]
+
+    os.utime(path, (time.time() - 7200, time.time() - 7200))
+    assert JwksSnapshot(str(path), max_age=3600).load() is None
+
+    path.write_text("{not json")
+    assert JwksSnapshot(str(path)).load() is None
+
+
+def test_cache_serves_snapshot_while_revalidating(tmp_path):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    snapshot = JwksSnapshot(str(tmp_path / "jwks.json"))
+    snapshot.save({"keys": [to_jwk(key, "kid-1")]})
+    fetch = Mock(side_effect=Exception("keycloak down"))
+    cache = JwksCache(fetch, ttl=300, min_refresh_interval=10, clock=FakeClock(), snapshot=snapshot)
+
+    assert cache.is_stale()
+    assert cache.get_key("kid-1") is not None
+    fetch.assert_called_once()
+    assert cache.get_key("kid-1") is not None
+
+
+def test_cache_saves_fetched_keys_to_snapshot(tmp_path):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwks = {"keys": [to_jwk(key, "kid-1")]}
+    path = str(tmp_path / "jwks.json")
+    cache = JwksCache(Mock(return_value=jwks), clock=FakeClock(), snapshot=JwksSnapshot(path))
+
+    assert cache.get_key("kid-1") is not None
+    assert JwksSnapshot(path).load() == jwks
+
+
+async def test_cache_awarm_revalidates_snapshot_in_background(tmp_path):
+    old_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    new_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    path = str(tmp_path / "jwks.json")
+    JwksSnapshot(path).save({"keys": [to_jwk(old_key, "kid-1")]})
+    fetched = asyncio.Event()
+
+    async def afetch():
+        await fetched.wait()
+        return {"keys": [to_jwk(new_key, "kid-2")]}
+
+    cache = JwksCache(Mock(), clock=FakeClock(), afetch=afetch, snapshot=JwksSnapshot(path))
+    assert await cache.awarm() == 1
+    assert await cache.aget_key("kid-1") is not None
+
+    fetched.set()
+    await cache._revalidation
+    assert await cache.aget_key("kid-2") is not None
+    assert "kid-2" in JwksKeyStore(JwksSnapshot(path).load())
+
+
+async def test_cache_async_refresh_saves_snapshot_in_thread(tmp_path, mocker):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwks = {"keys": [to_jwk(key, "kid-1")]}
+    snapshot = JwksSnapshot(str(tmp_path / "jwks.json"))
+    to_thread = mocker.spy(asyncio, "to_thread")
+
+    async def afetch():
+        return jwks
+
+    cache = JwksCache(Mock(), clock=FakeClock(), afetch=afetch, snapshot=snapshot)
+    assert await cache.aget_key("kid-1") is not None
+    to_thread.assert_called_once_with(snapshot.save, jwks)
+    assert snapshot.load() == jwks
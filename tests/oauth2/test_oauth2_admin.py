@@ -6,9 +6,12 @@ from unittest.mock import Mock
 from regtech_api_commons.api.exceptions import RegTechHttpException
 from regtech_api_commons.models.auth import RegTechUser
 from regtech_api_commons.oauth2.oauth2_admin import KeycloakSettings, OAuth2Admin
+from regtech_api_commons.observability.metrics import KEYCLOAK_ADMIN_SECONDS
 from regtech_regex.regex_config import RegexConfigs
 
 import base64
+import httpx
+import time
 import jwt
 from cryptography.hazmat.primitives.asymmetric import rsa
 
@@ -67,12 +70,104 @@ def test_get_claims(mocker):
     mock_request = mocker.patch("requests.get", return_value=mock_resp)
     actual_result = oauth2_admin.get_claims(token)
 
-    mock_request.assert_called_with(kc_settings.certs_url)
+    mock_request.assert_called_with(kc_settings.certs_url, timeout=kc_settings.jwks_fetch_timeout)
     print(f"{actual_result}")
     assert actual_result["iss"] == "http://localhost/"
     assert actual_result["aud"] == kc_settings.auth_client
 
 
+async def test_aget_claims(mocker: MockerFixture):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    token = jwt.encode(
+        {"sub": "test-user", "iss": "http://localhost/", "aud": kc_settings.auth_client},
+        private_key,
+        algorithm="RS256",
+        headers={"kid": "test-kid"},
+    )
+    public_numbers = private_key.public_key().public_numbers()
+    jwk = {
+        "kty": "RSA",
+        "kid": "test-kid",
+        "use": "sig",
+        "n": base64.urlsafe_b64encode(
+            public_numbers.n.to_bytes((public_numbers.n.bit_length() + 7) // 8, "big")
+        ).decode("utf-8"),
+        "e": base64.urlsafe_b64encode(
+            public_numbers.e.to_bytes((public_numbers.e.bit_length() + 7) // 8, "big")
+        ).decode("utf-8"),
+    }
+    requested_urls = []
+
+    def certs_handler(request: httpx.Request) -> httpx.Response:
+        requested_urls.append(str(request.url))
+        return httpx.Response(200, json={"keys": [jwk]})
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(certs_handler))
+    async_admin = OAuth2Admin(
+        KeycloakSettings(**{**kc_settings.model_dump(), "claims_verify_in_threadpool": True}), http_client=http_client
+    )
+    mock_request = mocker.patch("requests.get")
+
+    actual_result = await async_admin.aget_claims(token)
+
+    mock_request.assert_not_called()
+    assert requested_urls == [kc_settings.certs_url.unicode_string()]
+    assert actual_result["sub"] == "test-user"
+    assert actual_result["aud"] == kc_settings.auth_client
+
+    # the client was passed in, so it is left for its owner to close
+    await async_admin.aclose()
+    assert not http_client.is_closed
+    await http_client.aclose()
+
+
+def test_get_claims_unknown_kid(mocker):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    token = jwt.encode({"sub": "test-user"}, private_key, algorithm="RS256", headers={"kid": "unknown-kid"})
+
+    mock_resp = Mock()
+    mock_resp.json = Mock(return_value={"keys": []})
+    mock_request = mocker.patch("requests.get", return_value=mock_resp)
+    log_mock = mocker.patch("regtech_api_commons.oauth2.oauth2_admin.log")
+
+    assert OAuth2Admin(kc_settings).get_claims(token) is None
+    mock_request.assert_called_once_with(kc_settings.certs_url, timeout=kc_settings.jwks_fetch_timeout)
+    log_mock.warning.assert_called()
+
+
+def test_get_claims_cache(mocker: MockerFixture):
+    cached_admin = OAuth2Admin(KeycloakSettings(**{**kc_settings.model_dump(), "claims_cache_size": 10}))
+    claims = {"sub": "test-user", "exp": time.time() + 600}
+    verify_mock = mocker.patch.object(cached_admin, "_verify_claims", return_value=claims)
+
+    assert cached_admin.get_claims("token1") == claims
+    assert cached_admin.get_claims("token1") == claims
+    verify_mock.assert_called_once_with("token1")
+    assert cached_admin.claims_cache.hits == 1
+    assert cached_admin.claims_cache.misses == 1
+
+    cached_admin.get_claims("token2")
+    assert verify_mock.call_count == 2
+
+
+def test_get_claims_cache_skips_unverified_and_expiring_tokens(mocker: MockerFixture):
+    cached_admin = OAuth2Admin(KeycloakSettings(**{**kc_settings.model_dump(), "claims_cache_size": 10}))
+    verify_mock = mocker.patch.object(cached_admin, "_verify_claims", return_value=None)
+    assert cached_admin.get_claims("token1") is None
+    assert cached_admin.get_claims("token1") is None
+    assert verify_mock.call_count == 2
+
+    verify_mock.return_value = {"sub": "test-user", "exp": time.time() - 1}
+    cached_admin.get_claims("token2")
+    cached_admin.get_claims("token2")
+    assert verify_mock.call_count == 4
+    assert len(cached_admin.claims_cache) == 0
+
+
+def test_get_claims_cache_disabled_by_default():
+    assert oauth2_admin.claims_cache is None
+
+
 def test_update_user(mocker: MockerFixture):
     mock_update_user = mocker.patch("keycloak.KeycloakAdmin.update_user")
     user_id = "test-user-id"
@@ -168,6 +263,33 @@ def test_get_user(mocker: MockerFixture):
     assert isinstance(regtech_user, RegTechUser)
 
 
+def test_get_user_cache(mocker: MockerFixture):
+    cached_admin = OAuth2Admin(KeycloakSettings(**{**kc_settings.model_dump(), "user_cache_size": 10}))
+    mock_get_user = mocker.patch("keycloak.KeycloakAdmin.get_user")
+    mock_get_user.return_value = {"email": "test@local.host", "id": "testuser123", "username": "user1"}
+    mock_get_groups = mocker.patch("keycloak.KeycloakAdmin.get_user_groups")
+    mock_get_groups.return_value = [{"id": "test-id-1", "name": "TEST1LEI", "path": "/TEST1LEI"}]
+    mocker.patch("keycloak.KeycloakAdmin.update_user")
+    mocker.patch("keycloak.KeycloakAdmin.group_user_add")
+
+    first = cached_admin.get_user("testuser123")
+    second = cached_admin.get_user("testuser123")
+    assert first == second
+    assert first is not second
+    first.institutions.append("TEST2LEI")
+    assert cached_admin.get_user("testuser123").institutions == ["TEST1LEI"]
+    mock_get_user.assert_called_once()
+    mock_get_groups.assert_called_once()
+
+    cached_admin.update_user("testuser123", {"firstName": "new"})
+    cached_admin.get_user("testuser123")
+    assert mock_get_user.call_count == 2
+
+    cached_admin.associate_to_group("testuser123", "group-id")
+    cached_admin.get_user("testuser123")
+    assert mock_get_user.call_count == 3
+
+
 def test_get_group(mocker):
     lei = "TESTLEI"
     name = "Test Name"
@@ -243,6 +365,61 @@ def test_associate_to_leis(mocker):
         associate_to_lei_mock.assert_called_with(user_id, lei)
 
 
+def test_bulk_associate_to_leis(mocker: MockerFixture):
+    user_id = "test-id"
+    groups = {"/123456789TESTBANK123": {"id": "group-1", "name": "123456789TESTBANK123"}}
+    mock_get_group = mocker.patch("keycloak.KeycloakAdmin.get_group_by_path")
+    mock_get_group.side_effect = lambda path: groups.get(path, {"error": "Group path does not exist"})
+    mock_get_groups = mocker.patch("keycloak.KeycloakAdmin.get_groups")
+    mock_create_group = mocker.patch("keycloak.KeycloakAdmin.create_group")
+    mock_create_group.return_value = "group-2"
+    mock_group_user_add = mocker.patch("keycloak.KeycloakAdmin.group_user_add")
+
+    results = oauth2_admin.bulk_associate_to_leis(user_id, {"123456789TESTBANK123", "123456789TESTBANK234", "TESTLEI"})
+
+    mock_get_groups.assert_not_called()
+    assert mock_get_group.call_count == 2
+    mock_create_group.assert_called_once_with({"name": "123456789TESTBANK234"}, skip_exists=True)
+    assert mock_group_user_add.call_count == 2
+    mock_group_user_add.assert_any_call(user_id, "group-1")
+    mock_group_user_add.assert_any_call(user_id, "group-2")
+    assert results["123456789TESTBANK123"].success
+    assert results["123456789TESTBANK123"].group_id == "group-1"
+    assert not results["123456789TESTBANK123"].group_created
+    assert results["123456789TESTBANK234"].group_created
+    assert not results["TESTLEI"].success
+    assert "Invalid LEI TESTLEI" in results["TESTLEI"].error
+
+
+def test_bulk_associate_to_leis_partial_failure(mocker: MockerFixture):
+    user_id = "test-id"
+    mocker.patch("keycloak.KeycloakAdmin.get_group_by_path").side_effect = lambda path: {
+        "/123456789TESTBANK123": {"id": "group-1"},
+        "/123456789TESTBANK234": {"id": "group-2"},
+    }[path]
+
+    def group_user_add(user_id: str, group_id: str) -> None:
+        if group_id == "group-1":
+            raise KeycloakError("test", 500)
+
+    mocker.patch("keycloak.KeycloakAdmin.group_user_add").side_effect = group_user_add
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.log")
+
+    results = oauth2_admin.bulk_associate_to_leis(user_id, {"123456789TESTBANK123", "123456789TESTBANK234"})
+
+    assert not results["123456789TESTBANK123"].success
+    assert results["123456789TESTBANK234"].success
+
+
+def test_bulk_associate_to_leis_lookup_failure(mocker: MockerFixture):
+    mocker.patch("keycloak.KeycloakAdmin.get_group_by_path").side_effect = KeycloakError("test", 500)
+    mock_create_group = mocker.patch("keycloak.KeycloakAdmin.create_group")
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.log")
+    results = oauth2_admin.bulk_associate_to_leis("test-id", {"123456789TESTBANK123"})
+    assert not results["123456789TESTBANK123"].success
+    mock_create_group.assert_not_called()
+
+
 def test_delete_group(mocker):
     lei = "TESTLEI"
     kce_code = 500
@@ -264,3 +441,125 @@ def test_delete_group(mocker):
         oauth2_admin.delete_group(lei=lei)
     log_mock.exception.assert_called()
     assert e.value.status_code == kce_code
+
+
+def test_group_cache(mocker: MockerFixture):
+    cached_admin = OAuth2Admin(KeycloakSettings(**{**kc_settings.model_dump(), "group_cache_size": 10}))
+    lei = "123456789TESTBANK123"
+    mock_get_group = mocker.patch("keycloak.KeycloakAdmin.get_group_by_path")
+    mock_get_group.return_value = {"id": "group-1", "name": lei}
+    mock_group_user_add = mocker.patch("keycloak.KeycloakAdmin.group_user_add")
+    mock_update_group = mocker.patch("keycloak.KeycloakAdmin.update_group")
+    mock_delete_group = mocker.patch("keycloak.KeycloakAdmin.delete_group")
+
+    assert cached_admin.get_group_id(lei) == "group-1"
+    cached_admin.associate_to_lei("test-id", lei)
+    assert cached_admin.upsert_group(lei, "Test Name") == "group-1"
+    mock_get_group.assert_called_once_with(f"/{lei}")
+    mock_group_user_add.assert_called_once_with("test-id", "group-1")
+    mock_update_group.assert_called_once_with("group-1", {"name": lei})
+
+    cached_admin.delete_group(lei)
+    mock_delete_group.assert_called_once_with("group-1")
+    cached_admin.get_group_id(lei)
+    assert mock_get_group.call_count == 2
+
+
+def test_group_cache_populated_on_create(mocker: MockerFixture):
+    cached_admin = OAuth2Admin(KeycloakSettings(**{**kc_settings.model_dump(), "group_cache_size": 10}))
+    lei = "123456789TESTBANK123"
+    mock_get_group = mocker.patch("keycloak.KeycloakAdmin.get_group_by_path")
+    mock_get_group.return_value = None
+    mocker.patch("keycloak.KeycloakAdmin.create_group").return_value = "group-1"
+    mocker.patch("keycloak.KeycloakAdmin.group_user_add")
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.log")
+
+    cached_admin.associate_to_lei("test-id", lei)
+    assert cached_admin.get_group_id(lei) == "group-1"
+    mock_get_group.assert_called_once()
+
+
+def test_group_cache_invalidated_on_missing_group(mocker: MockerFixture):
+    cached_admin = OAuth2Admin(KeycloakSettings(**{**kc_settings.model_dump(), "group_cache_size": 10}))
+    lei = "123456789TESTBANK123"
+    mock_get_group = mocker.patch("keycloak.KeycloakAdmin.get_group_by_path")
+    mock_get_group.return_value = {"id": "group-1", "name": lei}
+    mocker.patch("keycloak.KeycloakAdmin.update_group").side_effect = KeycloakError("test", 404)
+    mock_group_user_add = mocker.patch("keycloak.KeycloakAdmin.group_user_add")
+    mock_group_user_add.side_effect = KeycloakError("test", 404)
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.log")
+
+    for call in (
+        lambda: cached_admin.upsert_group(lei, "Test Name"),
+        lambda: cached_admin.associate_to_lei("test-id", lei),
+    ):
+        assert cached_admin.get_group_id(lei) == "group-1"
+        with pytest.raises(RegTechHttpException) as e:
+            call()
+        assert e.value.status_code == 404
+        assert cached_admin._group_cache.get(lei) is None
+
+    assert cached_admin.get_group_id(lei) == "group-1"
+    assert not cached_admin.bulk_associate_to_leis("test-id", {lei})[lei].success
+    assert cached_admin._group_cache.get(lei) is None
+
+    expiring_settings = {**kc_settings.model_dump(), "group_cache_size": 10, "group_cache_ttl": 600}
+    assert OAuth2Admin(KeycloakSettings(**expiring_settings))._group_cache.ttl == 600
+
+
+def test_upsert_group_with_stale_cached_id(mocker: MockerFixture):
+    cached_admin = OAuth2Admin(KeycloakSettings(**{**kc_settings.model_dump(), "group_cache_size": 10}))
+    lei = "123456789TESTBANK123"
+    cached_admin._cache_group_id(lei, "deleted-group")
+    mock_update_group = mocker.patch("keycloak.KeycloakAdmin.update_group")
+    mock_update_group.side_effect = KeycloakError("test", 404)
+    mocker.patch("keycloak.KeycloakAdmin.get_group_by_path").return_value = {"error": "Group path does not exist"}
+    mocker.patch("keycloak.KeycloakAdmin.create_group").return_value = "group-2"
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.log")
+
+    assert cached_admin.upsert_group(lei, "Test Name") == "group-2"
+    mock_update_group.assert_called_once_with("deleted-group", {"name": lei})
+    assert cached_admin.get_group_id(lei) == "group-2"
+
+
+def test_delete_missing_group(mocker: MockerFixture):
+    mocker.patch("keycloak.KeycloakAdmin.get_group_by_path").return_value = {"error": "Group path does not exist"}
+    mock_delete_group = mocker.patch("keycloak.KeycloakAdmin.delete_group")
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.log")
+    with pytest.raises(RegTechHttpException) as e:
+        oauth2_admin.delete_group("123456789TESTBANK123")
+    assert e.value.status_code == 404
+    mock_delete_group.assert_not_called()
+
+
+def test_preload_group_cache(mocker: MockerFixture):
+    cached_admin = OAuth2Admin(KeycloakSettings(**{**kc_settings.model_dump(), "group_cache_size": 10}))
+    mock_get_groups = mocker.patch("keycloak.KeycloakAdmin.get_groups")
+    mock_get_groups.return_value = [
+        {"id": "group-1", "name": "123456789TESTBANK123"},
+        {"id": "group-2", "name": "123456789TESTBANK234"},
+    ]
+    mock_get_group = mocker.patch("keycloak.KeycloakAdmin.get_group_by_path")
+    mock_group_user_add = mocker.patch("keycloak.KeycloakAdmin.group_user_add")
+
+    assert cached_admin.preload_group_cache() == 2
+    assert cached_admin.get_group_id("123456789TESTBANK234") == "group-2"
+    cached_admin.bulk_associate_to_leis("test-id", {"123456789TESTBANK123", "123456789TESTBANK234"})
+    mock_get_groups.assert_called_once()
+    mock_get_group.assert_not_called()
+    assert mock_group_user_add.call_count == 2
+    assert oauth2_admin.preload_group_cache() == 0
+
+
+def test_admin_calls_are_timed(mocker: MockerFixture):
+    mocker.patch("keycloak.KeycloakAdmin.update_user").side_effect = [None, KeycloakError("test", 500)]
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.log")
+    successes = KEYCLOAK_ADMIN_SECONDS.count(operation="update_user", outcome="success")
+    errors = KEYCLOAK_ADMIN_SECONDS.count(operation="update_user", outcome="error")
+
+    oauth2_admin.update_user("test", {"foo": "bar"})
+    with pytest.raises(RegTechHttpException):
+        oauth2_admin.update_user("test", {"foo": "bar"})
+
+    assert KEYCLOAK_ADMIN_SECONDS.count(operation="update_user", outcome="success") == successes + 1
+    assert KEYCLOAK_ADMIN_SECONDS.count(operation="update_user", outcome="error") == errors + 1
@@ -4,7 +4,14 @@ from fastapi.security import OAuth2AuthorizationCodeBearer
 from regtech_api_commons.models.auth import AuthenticatedUser
 from regtech_api_commons.oauth2.config import KeycloakSettings
 from regtech_api_commons.oauth2.oauth2_admin import OAuth2Admin
-from regtech_api_commons.oauth2.oauth2_backend import BearerTokenAuthBackend
+from regtech_api_commons.observability.tracing import set_tracer
+from regtech_api_commons.oauth2.oauth2_backend import (
+    DEFAULT_SCOPE_CLAIMS,
+    REALM_ROLES,
+    UNAUTHENTICATED,
+    BearerTokenAuthBackend,
+    ClaimsAuthCredentials,
+)
 from starlette.authentication import AuthCredentials
 from starlette.requests import HTTPConnection
 
@@ -76,7 +83,7 @@ async def test_oauth2_authenticate_with_claims(mocker):
 
     mock_token_bearer.return_value = return_token_bearer_value("Test token")
 
-    mock_get_claims = mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.get_claims")
+    mock_get_claims = mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.aget_claims")
 
     mock_get_claims.return_value = claims
 
@@ -104,7 +111,7 @@ async def test_oauth2_authenticate_with_claims_error(mocker: MockerFixture):
 
     mock_token_bearer.return_value = return_token_bearer_value("Test token")
 
-    mock_get_claims = mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.get_claims")
+    mock_get_claims = mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.aget_claims")
 
     mock_get_claims.side_effect = Exception("Test")
 
@@ -135,3 +142,73 @@ async def test_oauth2_authenticate_without_claims(mocker):
 
     assert response[0].scopes == AuthCredentials("unauthenticated").scopes
     assert response[1].is_authenticated is False
+
+
+@pytest.mark.asyncio
+async def test_oauth2_authenticate_with_realm_roles(mocker):
+    mock_token_bearer = mocker.patch("fastapi.security.OAuth2AuthorizationCodeBearer.__call__")
+    mock_token_bearer.return_value = "Test token"
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.aget_claims").return_value = claims
+
+    scope = {
+        "method": "GET",
+        "type": "http",
+        "headers": [(b"host", b"localhost"), (b"accept", b"application/json"), (b"authorization", b"test")],
+    }
+
+    backend = BearerTokenAuthBackend(oauth2_scheme, oauth2_admin, scope_claims=[*DEFAULT_SCOPE_CLAIMS, REALM_ROLES])
+    response = await backend.authenticate(HTTPConnection(scope=scope))
+
+    assert response[0].scopes == [
+        "manage-account",
+        "manage-account-links",
+        "view-profile",
+        "offline_access",
+        "uma_authorization",
+        "authenticated",
+    ]
+
+
+async def test_unauthenticated_is_shared():
+    scope = {"method": "GET", "type": "http", "headers": [(b"host", b"localhost")]}
+
+    first = await bearer_token.authenticate(HTTPConnection(scope=scope))
+    second = await bearer_token.authenticate(HTTPConnection(scope=scope))
+
+    assert first is UNAUTHENTICATED
+    assert second is UNAUTHENTICATED
+
+    credentials = first[0]
+    with pytest.raises(AttributeError):
+        credentials.scopes.append("manage-users")
+    with pytest.raises(AttributeError):
+        credentials.scopes = ["manage-users"]
+    assert "manage-users" not in credentials.scopes
+    assert credentials.scopes == AuthCredentials("unauthenticated").scopes
+
+
+def test_claims_credentials_are_lazy():
+    credentials = ClaimsAuthCredentials(claims, DEFAULT_SCOPE_CLAIMS, ("authenticated",))
+    assert credentials._scopes is None
+    assert credentials.scope_set == frozenset(
+        ["manage-account", "manage-account-links", "view-profile", "authenticated"]
+    )
+
+    credentials.scopes = ["other"]
+    assert credentials.scope_set == frozenset(["other"])
+
+
+async def test_oauth2_authenticate_spans(mocker):
+    mocker.patch("fastapi.security.OAuth2AuthorizationCodeBearer.__call__").return_value = "Test token"
+    mocker.patch("regtech_api_commons.oauth2.oauth2_admin.OAuth2Admin.aget_claims").return_value = claims
+    tracer = mocker.MagicMock()
+    set_tracer(tracer)
+    try:
+        scope = {"method": "GET", "type": "http", "headers": [(b"authorization", b"test")]}
+        await bearer_token.authenticate(HTTPConnection(scope=scope))
+    finally:
+        set_tracer(None)
+    assert [c.args[0] for c in tracer.start_as_current_span.call_args_list] == [
+        "regtech.authenticate",
+        "regtech.claims.map",
+    ]
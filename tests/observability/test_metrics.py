@@ -0,0 +1,74 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from regtech_api_commons.api.router_wrapper import Router
+from regtech_api_commons.observability.metrics import MetricsRegistry
+
+
+def test_counter():
+    registry = MetricsRegistry()
+    counter = registry.counter("responses_total", "Responses.", ["handler", "status"])
+    counter.inc(handler="http_exception", status=404)
+    counter.inc(2, handler="http_exception", status=404)
+    counter.inc(handler="general_exception", status=500)
+
+    assert counter.value(handler="http_exception", status="404") == 3
+    assert registry.render() == (
+        "# HELP responses_total Responses.\n"
+        "# TYPE responses_total counter\n"
+        'responses_total{handler="http_exception",status="404"} 3.0\n'
+        'responses_total{handler="general_exception",status="500"} 1.0\n'
+    )
+    with pytest.raises(ValueError):
+        counter.inc(handler="http_exception")
+
+
+def test_histogram():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("call_seconds", "Calls.", ["operation"], buckets=[0.1, 1])
+    histogram.observe(0.05, operation="get_user")
+    histogram.observe(0.1, operation="get_user")
+    histogram.observe(5, operation="get_user")
+
+    assert histogram.count(operation="get_user") == 3
+    assert histogram.sum(operation="get_user") == pytest.approx(5.15)
+    assert registry.render().splitlines()[2:] == [
+        'call_seconds_bucket{operation="get_user",le="0.1"} 2',
+        'call_seconds_bucket{operation="get_user",le="1.0"} 2',
+        'call_seconds_bucket{operation="get_user",le="+Inf"} 3',
+        'call_seconds_sum{operation="get_user"} 5.15',
+        'call_seconds_count{operation="get_user"} 3',
+    ]
+
+
+def test_histogram_time_sets_outcome():
+    histogram = MetricsRegistry().histogram("fetch_seconds", "Fetches.", ["outcome"])
+    with histogram.time():
+        pass
+    with pytest.raises(RuntimeError):
+        with histogram.time():
+            raise RuntimeError("fetch failed")
+
+    assert histogram.count(outcome="success") == 1
+    assert histogram.count(outcome="error") == 1
+
+
+def test_registry_returns_existing_metric():
+    registry = MetricsRegistry()
+    counter = registry.counter("responses_total", "Responses.", ["status"])
+    assert registry.counter("responses_total", "Responses.", ["status"]) is counter
+    with pytest.raises(ValueError):
+        registry.histogram("responses_total", "Responses.", ["status"])
+
+
+def test_router_metrics_endpoint():
+    registry = MetricsRegistry()
+    registry.counter("responses_total", "Responses.", ["status"]).inc(status=404)
+    app = FastAPI()
+    app.include_router(Router(metrics=registry))
+
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert 'responses_total{status="404"} 1.0' in response.text
@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+from regtech_api_commons.api.dependencies import verify_lei
+from regtech_api_commons.api.exceptions import RegTechHttpException
+from regtech_api_commons.api.http_client import SharedHttpClient
+from regtech_api_commons.observability import tracing
+from regtech_api_commons.observability.tracing import set_tracer, span
+
+
+class RecordingTracer:
+    def __init__(self):
+        self.spans = []
+        self.errors = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        self.spans.append((name, attributes))
+        try:
+            yield name
+        except Exception as e:
+            self.errors.append((name, e))
+            raise
+
+
+@pytest.fixture
+def tracer():
+    tracer = RecordingTracer()
+    set_tracer(tracer)
+    yield tracer
+    set_tracer(None)
+
+
+def test_span_is_shared_no_op_without_tracer():
+    assert tracing.get_tracer() is None
+    assert span("regtech.test") is span("regtech.other", {"key": "value"})
+    with span("regtech.test") as current:
+        assert current is not None
+
+
+def test_span_uses_tracer(tracer: RecordingTracer):
+    with span("regtech.test", {"key": "value"}) as current:
+        assert current == "regtech.test"
+    assert tracer.spans == [("regtech.test", {"key": "value"})]
+
+
+def test_span_drops_none_attributes(tracer: RecordingTracer):
+    with span("regtech.token.key_lookup", {"kid": None, "alg": "RS256"}):
+        pass
+    assert tracer.spans == [("regtech.token.key_lookup", {"alg": "RS256"})]
+
+
+async def test_verify_lei_spans(tracer: RecordingTracer):
+    http_client = SharedHttpClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"is_active": False}))
+    )
+    lei_check = verify_lei("http://institutions/", http_client)
+    request = Request(scope={"type": "http", "headers": [(b"authorization", b"123")]})
+    with pytest.raises(RegTechHttpException):
+        await lei_check(request=request, lei="1234567890ZXWVUTSR00")
+    await http_client.aclose()
+
+    assert tracer.spans == [
+        ("regtech.verify_lei", {"lei": "1234567890ZXWVUTSR00"}),
+        ("regtech.institutions_api", {"endpoint": "lei"}),
+    ]
+    assert [name for name, _ in tracer.errors] == ["regtech.verify_lei"]
@@ -0,0 +1,106 @@
+import time
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+from regtech_api_commons.api.dependencies import verify_lei, verify_leis
+from regtech_api_commons.api.exceptions import RegTechHttpException
+from regtech_api_commons.api.http_client import SharedHttpClient
+from regtech_api_commons.oauth2.async_oauth2_admin import AsyncOAuth2Admin
+from regtech_api_commons.oauth2.oauth2_admin import OAuth2Admin
+from regtech_api_commons.testing.fakes import FakeInstitutionsApi, FakeKeycloak, FakeUpstream, FaultInjection
+
+
+async def test_minted_tokens_verify_in_process():
+    keycloak = FakeKeycloak()
+    user_id = keycloak.add_user("user1", first_name="Test", last_name="User")
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=keycloak))
+    oauth2_admin = OAuth2Admin(keycloak.settings(), http_client=http_client)
+
+    claims = await oauth2_admin.aget_claims(keycloak.mint_token(user_id, institutions=["123456789TESTBANK123"]))
+    assert claims["sub"] == user_id
+    assert claims["name"] == "Test User"
+    assert claims["institutions"] == ["/123456789TESTBANK123"]
+    assert await oauth2_admin.aget_claims(keycloak.mint_token(user_id, expires_in=-60)) is None
+    assert keycloak.request_counts[f"GET /realms/{keycloak.realm}/protocol/openid-connect/certs"] == 1
+    await http_client.aclose()
+
+
+def test_jwks_is_unpadded():
+    (jwk,) = FakeKeycloak().jwks()["keys"]
+    assert not jwk["n"].endswith("=")
+    assert jwk["e"] == "AQAB"
+
+
+def test_upstream_requires_routes():
+    with pytest.raises(TypeError):
+        FakeUpstream("http://upstream")
+
+
+def test_admin_endpoints_served():
+    keycloak = FakeKeycloak()
+    user_id = keycloak.add_user("user1", first_name="Test", last_name="User")
+    with keycloak.serve():
+        oauth2_admin = OAuth2Admin(keycloak.settings())
+        oauth2_admin.associate_to_lei(user_id, "123456789TESTBANK123")
+        assert oauth2_admin.get_user(user_id).institutions == ["123456789TESTBANK123"]
+
+        results = oauth2_admin.bulk_associate_to_leis(user_id, {"123456789TESTBANK123", "123456789TESTBANK234"})
+        assert all(result.success for result in results.values())
+        assert oauth2_admin.upsert_group("123456789TESTBANK234", "Bank 234") == results["123456789TESTBANK234"].group_id
+
+        oauth2_admin.update_user(user_id, {"firstName": "New"})
+        oauth2_admin.delete_group("123456789TESTBANK123")
+        user = oauth2_admin.get_user(user_id)
+        assert user.name == "New User"
+        assert user.institutions == ["123456789TESTBANK234"]
+
+
+async def test_async_admin_endpoints_served():
+    keycloak = FakeKeycloak()
+    user_id = keycloak.add_user("user1")
+    with keycloak.serve():
+        oauth2_admin = AsyncOAuth2Admin(keycloak.settings())
+        await oauth2_admin.associate_to_lei(user_id, "123456789TESTBANK123")
+        assert (await oauth2_admin.get_user(user_id)).institutions == ["123456789TESTBANK123"]
+        await oauth2_admin.aclose()
+
+
+async def test_institutions_api():
+    institutions = FakeInstitutionsApi()
+    institutions.set_lei("123456789TESTBANK234", False)
+    http_client = SharedHttpClient(transport=httpx.ASGITransport(app=institutions))
+    request = Request(scope={"type": "http", "headers": [(b"authorization", b"123")]})
+
+    await verify_lei(institutions.institutions_url, http_client)(request=request, lei="123456789TESTBANK123")
+    with pytest.raises(RegTechHttpException) as e:
+        await verify_leis(institutions.institutions_url, http_client, bulk_url=institutions.bulk_url)(
+            request=request, leis=["123456789TESTBANK123", "123456789TESTBANK234"]
+        )
+    assert e.value.detail == "LEIs (['123456789TESTBANK234']) are in an inactive state."
+    assert institutions.request_counts["GET /v1/institutions"] == 1
+    await http_client.aclose()
+
+
+async def test_fault_injection():
+    institutions = FakeInstitutionsApi(faults=FaultInjection(latency=0.05, error_rate=0.5, seed=1))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=institutions), base_url="http://test") as client:
+        start = time.perf_counter()
+        statuses = [(await client.get("/v1/institutions/123456789TESTBANK123")).status_code for _ in range(10)]
+        assert time.perf_counter() - start >= 0.5
+    assert set(statuses) == {200, 503}
+
+
+async def test_jwks_snapshot_covers_keycloak_outage(tmp_path):
+    keycloak = FakeKeycloak()
+    token = keycloak.mint_token("user-1")
+    settings = keycloak.settings(jwks_snapshot_path=str(tmp_path / "jwks.json"))
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=keycloak))
+    assert await OAuth2Admin(settings, http_client=http_client).aget_claims(token) is not None
+
+    keycloak.faults.error_rate = 1
+    restarted_admin = OAuth2Admin(settings, http_client=http_client)
+    assert await restarted_admin.awarm_keys() == 1
+    assert (await restarted_admin.aget_claims(token))["sub"] == "user-1"
+    await http_client.aclose()
@@ -0,0 +1,80 @@
+import pytest
+
+from regtech_api_commons.utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_get_and_set():
+    cache = TTLCache(maxsize=2)
+    assert cache.get("a") is None
+    assert cache.get("a", "default") == "default"
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert len(cache) == 1
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_default_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    clock.now += 9
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1, ttl=1)
+    cache.set("b", 2)
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_no_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, clock=clock)
+    cache.set("a", 1)
+    clock.now += 1_000_000
+    assert cache.get("a") == 1
+
+
+def test_invalidate_and_clear():
+    cache = TTLCache(maxsize=3)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_invalid_maxsize():
+    with pytest.raises(ValueError):
+        TTLCache(maxsize=0)